@@ -1,15 +1,73 @@
 from flask import request, make_response, jsonify, redirect
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, set_access_cookies, unset_jwt_cookies, create_refresh_token, set_refresh_cookies
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, verify_jwt_in_request, get_jwt_identity, current_user, set_access_cookies, unset_jwt_cookies, create_refresh_token, set_refresh_cookies
 from flask_restful import Resource
-from models import User, Event, Group, RSVP, Comment, GroupInvitation
+from models import User, Event, Group, RSVP, Comment, GroupInvitation, RSVP_STATUSES
+from models import USER_PROFILE_LOADERS, GROUP_LOADERS, RSVP_LOADERS, INVITATION_LOADERS
 from config import app, db, api
+from pagination import MAX_PAGE_SIZE, page_args, paginate, page_headers
+from search import search
+from streaming import stream_format, stream
+from event_filters import DATE_KEYS, date_key, date_cursor, date_range, sorted_by_date, list_events, today, hosted_by_group_mates
+from pagination import decode_cursor, encode_cursor
+from cache import cached, invalidate
+from passwords import hasher, HasherBusy
+from instrumentation import init_instrumentation
+from responses import init_responses
+from identity import init_identity, jwt_user_id, forget_user
+from counters import comments_added, comments_added_many
+from rsvps import upsert_rsvps
+from feed import activity, queue_publish, queue_backfill, read_feed
+from purge import init_purge, remove
+from ratelimit import init_rate_limits, limited
+from replicas import init_replicas
+from memberships import add_members, is_member, members_among
+from sqlalchemy import and_, insert, select
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-import json
 import os
 
 
 # Initialize JWT
 jwt = JWTManager(app)
+init_identity(jwt)
+
+# Upper bound on items per batch request
+MAX_BATCH_SIZE = 500
+
+def batch_items(data, key):
+    # Returns (items, error_response) for a batch request body
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, ({"message": f"{key} must be a non-empty list"}, 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, ({"message": f"At most {MAX_BATCH_SIZE} items per request"}, 400)
+    return items, None
+
+def is_id(value):
+    # JSON true/false decode to bools, which are ints to isinstance()
+    return type(value) is int
+
+def has_event_id(item):
+    return isinstance(item, dict) and is_id(item.get('event_id'))
+
+# SQLite builds before 3.32 allow at most 999 bound parameters per statement
+MAX_INSERT_PARAMETERS = 999
+
+def insert_returning_ids(model, rows):
+    # One multi-row INSERT ... VALUES ... RETURNING per chunk, handing back
+    # the new ids in input order. A statement allocates its ids in VALUES
+    # order, so sorting the returned ids lines them up with the rows.
+    if not rows:
+        return []
+    chunk = max(1, MAX_INSERT_PARAMETERS // len(rows[0]))
+    ids = []
+    for start in range(0, len(rows), chunk):
+        statement = insert(model).values(rows[start:start + chunk]).returning(model.id)
+        ids.extend(sorted(db.session.scalars(statement)))
+    return ids
+
+def search_stream_error():
+    return {"message": "Search results cannot be streamed; page through them instead"}, 400
 
 def unset_jwt():
     resp = make_response(redirect(app.config.get('BASE_URL', '/') + '/', 302))
@@ -24,12 +82,32 @@ def assign_access_refresh_tokens(user_id, url):
     set_refresh_cookies(resp, refresh_token)
     return resp
 
+# Shared with asgi.py, which serves the same endpoints asynchronously
+def register_response(user):
+    access_token = create_access_token(identity=str(user.id))
+    response = make_response({"message": "User registered successfully", "user": user.serialize()}, 201)
+    response.set_cookie('access_token', access_token, httponly=True, secure=True, samesite='Strict')
+    return response
+
+def login_response(user_id):
+    # Assign access and refresh tokens and redirect to the specified URL
+    response = assign_access_refresh_tokens(user_id=user_id, url="/")
+
+    # Add the user ID to the response data
+    response_data = {"user": {"id": user_id}, "message": "Login successful"}
+    response.set_data(app.json.dumps(response_data))
+    response.mimetype = 'application/json'
+    response.status_code = 200
+
+    return response
+
 @app.route('/')
 def home():
     return "Welcome to the Event Manager API!"
 
 # Register Resource
 class Register(Resource):
+    @limited('auth')
     def post(self):
         data = request.get_json()
         if User.query.filter_by(username=data['username']).first() is not None:
@@ -41,17 +119,18 @@ class Register(Resource):
             return {"message": "Missing required fields"}, 400
 
         new_user = User(username=data['username'], email=data['email'])
-        new_user.password = data['password']
+        try:
+            new_user.password = data['password']
+        except HasherBusy:
+            return {"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"}
         db.session.add(new_user)
         db.session.commit()
 
-        access_token = create_access_token(identity=new_user.id)
-        response = make_response({"message": "User registered successfully", "user": new_user.to_dict()})
-        response.set_cookie('access_token', access_token, httponly=True, secure=True, samesite='Strict')
-        return response, 201
+        return register_response(new_user)
 
 # Login Resource
 class Login(Resource):
+    @limited('auth')
     def post(self):
         data = request.get_json()
 
@@ -61,47 +140,62 @@ class Login(Resource):
 
         # Find the user by username
         user = User.query.filter_by(username=data['username']).first()
-        if user is None or not user.check_password(data['password']):
-            return {"message": "Invalid username or password"}, 401
+        try:
+            if user is None or not user.check_password(data['password']):
+                return {"message": "Invalid username or password"}, 401
 
-        # Assign access and refresh tokens and redirect to the specified URL
-        response = assign_access_refresh_tokens(user_id=user.id, url="/")
+        except HasherBusy:
+            return {"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"}
 
-        # Add the user ID to the response data
-        response_data = {"user": {"id": user.id}, "message": "Login successful"}
-        response.set_data(json.dumps(response_data))
-        response.mimetype = 'application/json'
-        response.status_code = 200
+        # Upgrade hashes made with a different BCRYPT_ROUNDS. Best effort: a
+        # busy pool leaves it for the next login instead of failing this one.
+        if hasher.needs_rehash(user.password_hash):
+            try:
+                user.password = data['password']
+                db.session.commit()
+            except HasherBusy:
+                db.session.rollback()
 
-        return response
+        return login_response(user.id)
 
 class Logout(Resource):
     @jwt_required()
     def post(self):
+        forget_user(get_jwt_identity())
         return unset_jwt()
 
 # User Resource for listing and searching users
 class UserList(Resource):
     def get(self):
-        limit = request.args.get('limit', 30)  # Default to 30 if no limit is provided
         query = request.args.get('q', '')
+        fmt = stream_format()
+        if fmt:
+            return search_stream_error() if query else stream(User.query, [User.id], fmt)
 
+        limit, after = page_args()
         if query:
-            users = User.query.filter(User.username.ilike(f"%{query}%")).limit(limit).all()
+            users, next_cursor = search(User.query, User, query, limit, after)
         else:
-            users = User.query.limit(limit).all()
+            users, next_cursor = paginate(User.query, [User.id], limit, after)
 
-        return [user.to_dict() for user in users], 200
+        return [user.serialize() for user in users], 200, page_headers(next_cursor)
 
 # User Profile Resource
 class UserProfile(Resource):
     @jwt_required()
     def get(self, user_id=None):
         if user_id:
-            user = User.query.get_or_404(user_id)
+            user = User.query.options(*USER_PROFILE_LOADERS).get_or_404(user_id)
         else:
-            current_user_id = get_jwt_identity()
-            user = User.query.get_or_404(current_user_id)
+            user = current_user
+
+        # The user's events and their own RSVP status in one outer join
+        events = db.session.execute(
+            select(Event.id, Event.name, Event.date, RSVP.status)
+            .outerjoin(RSVP, and_(RSVP.event_id == Event.id, RSVP.user_id == user.id))
+            .where(Event.user_id == user.id)
+            .order_by(Event.id)
+        )
 
         return {
             "id": user.id,
@@ -113,31 +207,35 @@ class UserProfile(Resource):
                     "id": event.id,
                     "name": event.name,
                     "date": event.date.strftime('%Y-%m-%d'),
-                    "rsvp_status": next(
-                        (rsvp.status for rsvp in user.rsvps if rsvp.event_id == event.id),
-                        "Needs RSVP"
-                    )
+                    "rsvp_status": event.status or "Needs RSVP"
                 }
-                for event in user.events
+                for event in events
             ]
         }, 200
     
 # Event Resource for listing and searching events
 class EventList(Resource):
+    @cached('events')
     def get(self):
-        limit = request.args.get('limit', 30)
-        query = request.args.get('q', '')
-
-        if query:
-            events = Event.query.filter(Event.name.ilike(f"%{query}%")).limit(limit).all()
-        else:
-            events = Event.query.limit(limit).all()
-
-        return [event.to_dict() for event in events], 200
-
+        # ?q= search, ?from=/?to= date range and ?sort=id|date (event_filters.py)
+        fmt = stream_format()
+        if fmt:
+            if request.args.get('q'):
+                return search_stream_error()
+            events = date_range(Event.query, request.args)
+            if sorted_by_date(request.args):
+                after = request.args.get('after')
+                return stream(events, DATE_KEYS, fmt, after=date_cursor(decode_cursor(after)) if after else None)
+            return stream(events, [Event.id], fmt)
+
+        limit, after = page_args()
+        events, next_cursor = list_events(Event.query, request.args, limit, after)
+        return [event.serialize() for event in events], 200, page_headers(next_cursor)
+
+    @limited('write')
     @jwt_required()
     def post(self):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         data = request.get_json()
 
         if not all(k in data for k in ("name", "date", "location", "description")):
@@ -156,14 +254,58 @@ class EventList(Resource):
             user_id=current_user_id
         )
         db.session.add(new_event)
+        db.session.flush()
+        queue_publish(db.session, [activity(current_user_id, 'event', new_event.id)])
         db.session.commit()
-        return {"message": "Event created successfully", "event": new_event.to_dict()}, 201
+        invalidate('events')
+        return {"message": "Event created successfully", "event": new_event.serialize()}, 201
+
+def upcoming_bucket():
+    # The feed starts at today(), so cached pages are per day, and per user
+    # for ?scope=groups
+    if request.args.get('scope') == 'groups':
+        verify_jwt_in_request()
+        return f"{today().date()}:user:{get_jwt_identity()}"
+    return str(today().date())
+
+class UpcomingEvents(Resource):
+    # Events from the start of today on, soonest first; ?scope=groups keeps
+    # those hosted by the current user or members of their groups
+    @cached('events', 'groups', bucket=upcoming_bucket)
+    def get(self):
+        scope = request.args.get('scope', 'all')
+        if scope not in ('all', 'groups'):
+            return {"message": "scope must be all or groups"}, 400
+
+        limit, after = page_args()
+        events = Event.query.filter(Event.date >= today())
+        if scope == 'groups':
+            # upcoming_bucket() has already checked the token when caching is on
+            verify_jwt_in_request()
+            events = events.filter(hosted_by_group_mates(jwt_user_id()))
+        events, next_cursor = paginate(
+            date_range(events, request.args), DATE_KEYS, limit, date_cursor(after), key_of=date_key,
+        )
+        return [event.serialize() for event in events], 200, page_headers(next_cursor)
+
+class Feed(Resource):
+    # New events and comments from people sharing a group with the current
+    # user, newest first (feed.py)
+    @jwt_required()
+    def get(self):
+        limit, after = page_args()
+        if after is not None and (len(after) != 1 or not is_id(after[0])):
+            return {"message": "Invalid cursor"}, 400
+        items, next_id = read_feed(db.session, jwt_user_id(), limit, after[0] if after else None)
+        next_cursor = encode_cursor([next_id]) if next_id is not None else None
+        return items, 200, page_headers(next_cursor)
 
 class EventDetail(Resource):
+    @cached('event:{event_id}')
     def get(self, event_id):
         event = Event.query.get_or_404(event_id)
-        rsvps = RSVP.query.filter_by(event_id=event_id).all()
-        event_data = event.to_dict()
+        rsvps = RSVP.query.options(*RSVP_LOADERS).filter_by(event_id=event_id).all()
+        event_data = event.serialize()
         event_data['rsvps'] = [
             {
                 'user_id': rsvp.user.id,
@@ -174,51 +316,64 @@ class EventDetail(Resource):
         ]
         return event_data, 200
 
+    @limited('write')
     @jwt_required()
     def put(self, event_id):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         event = Event.query.get_or_404(event_id)
 
         if event.user_id != current_user_id:
             return {"message": "You do not have permission to update this event"}, 403
 
         data = request.get_json()
+        if 'date' in data:
+            try:
+                event.date = datetime.strptime(data['date'], "%Y-%m-%dT%H:%M")
+            except (TypeError, ValueError):
+                return {"message": "Invalid date format, expected YYYY-MM-DDTHH:MM"}, 400
         event.name = data.get('name', event.name)
-        event.date = data.get('date', event.date)
         event.location = data.get('location', event.location)
         event.description = data.get('description', event.description)
 
         db.session.commit()
-        return {"message": "Event updated successfully", "event": event.to_dict()}, 200
+        invalidate('events', f"event:{event_id}")
+        return {"message": "Event updated successfully", "event": event.serialize()}, 200
 
+    @limited('write')
     @jwt_required()
     def delete(self, event_id):
-        current_user_id = str(get_jwt_identity())
+        current_user_id = jwt_user_id()
         event = Event.query.get_or_404(event_id)
 
-        if str(event.user_id) != current_user_id:
+        if event.user_id != current_user_id:
             return {"message": "You do not have permission to delete this event"}, 403
 
-        db.session.delete(event)
-        db.session.commit()
+        remove(event)
+        invalidate('events', f"event:{event_id}", f"event:{event_id}:rsvps", f"event:{event_id}:comments")
         return {"message": "Event deleted successfully"}, 200
 
 # Group Resource for listing and searching groups
 class GroupList(Resource):
+    @cached('groups')
     def get(self):
-        limit = request.args.get('limit', 30)
         query = request.args.get('q', '')
+        groups = Group.query.options(*GROUP_LOADERS)
+        fmt = stream_format()
+        if fmt:
+            return search_stream_error() if query else stream(groups, [Group.id], fmt)
 
+        limit, after = page_args()
         if query:
-            groups = Group.query.filter(Group.name.ilike(f"%{query}%")).limit(limit).all()
+            groups, next_cursor = search(groups, Group, query, limit, after)
         else:
-            groups = Group.query.limit(limit).all()
+            groups, next_cursor = paginate(groups, [Group.id], limit, after)
 
-        return [group.to_dict() for group in groups], 200
+        return [group.serialize() for group in groups], 200, page_headers(next_cursor)
 
+    @limited('write')
     @jwt_required()
     def post(self):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         data = request.get_json()
 
         if not all(k in data for k in ("name", "description")):
@@ -227,11 +382,13 @@ class GroupList(Resource):
         new_group = Group(name=data['name'], description=data['description'], user_id=current_user_id)
         db.session.add(new_group)
         db.session.commit()
-        return {"message": "Group created successfully", "group": new_group.to_dict()}, 201
+        invalidate('groups')
+        return {"message": "Group created successfully", "group": new_group.serialize()}, 201
 
 class GroupDetail(Resource):
+    @cached('group:{group_id}')
     def get(self, group_id):
-        group = Group.query.get_or_404(group_id)
+        group = Group.query.options(*GROUP_LOADERS).get_or_404(group_id)
         return {
             'id': group.id,
             'name': group.name,
@@ -240,34 +397,62 @@ class GroupDetail(Resource):
             'members': [{'id': user.id, 'username': user.username} for user in group.members]
         }, 200
     
+    @limited('write')
     @jwt_required()
     def delete(self, group_id):
-        current_user_id = str(get_jwt_identity())
+        current_user_id = jwt_user_id()
         group = Group.query.get_or_404(group_id)
 
-        if str(group.user_id) != current_user_id:
+        if group.user_id != current_user_id:
             return {"message": "You do not have permission to delete this group"}, 403
 
-        db.session.delete(group)
-        db.session.commit()
+        remove(group)
+        invalidate('groups', f"group:{group_id}")
         return {"message": "Group deleted successfully"}, 200
 
+class GroupMembers(Resource):
+    @limited('heavy')
+    def get(self, group_id):
+        # ?user_ids=1,2,3: which of these users are members, in one query
+        raw = request.args.get('user_ids', '')
+        try:
+            user_ids = [int(user_id) for user_id in raw.split(',') if user_id.strip()]
+        except ValueError:
+            return {"message": "user_ids must be comma-separated integers"}, 400
+        if not user_ids:
+            return {"message": "user_ids must be a non-empty list"}, 400
+        if len(user_ids) > MAX_BATCH_SIZE:
+            return {"message": f"At most {MAX_BATCH_SIZE} items per request"}, 400
+
+        Group.query.get_or_404(group_id)
+        members = members_among(group_id, user_ids)
+        return {
+            "members": [user_id for user_id in user_ids if user_id in members],
+            "non_members": [user_id for user_id in user_ids if user_id not in members],
+        }, 200
+
 # Group Invitations
 class GroupInvite(Resource):
+    @limited('write')
     @jwt_required()
     def post(self, group_id):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         data = request.get_json()
 
+        if 'invited_user_ids' in data:
+            return self.invite_many(group_id, current_user_id, data)
+
         if not all(k in data for k in ("group_id", "invited_user_id")):
             return {"message": "Missing required fields"}, 400
         
         group = Group.query.get_or_404(data["group_id"])
 
-        if str(group.user_id) != str(current_user_id):
+        if group.user_id != current_user_id:
             return {"message": "You do not have permission to invite users to this group"}, 403
 
         invited_user = User.query.get_or_404(data['invited_user_id'])
+        if is_member(group.id, invited_user.id):
+            return {"message": "User is already a member of this group"}, 409
 
         new_invitation = GroupInvitation(
             group_id=group.id,
@@ -277,98 +462,247 @@ class GroupInvite(Resource):
         )
         db.session.add(new_invitation)
         db.session.commit()
-        return {"message": "Invitation sent successfully", "invitation": new_invitation.to_dict()}, 201
+        return {"message": "Invitation sent successfully", "invitation": new_invitation.serialize()}, 201
+
+    def invite_many(self, group_id, current_user_id, data):
+        # Batch form: {"invited_user_ids": [...]}. Users are checked with one
+        # IN query, invitations inserted with one multi-row INSERT, one commit.
+        user_ids, error = batch_items(data, 'invited_user_ids')
+        if error:
+            return error
+
+        group = Group.query.get_or_404(group_id)
+        if group.user_id != current_user_id:
+            return {"message": "You do not have permission to invite users to this group"}, 403
+
+        valid_ids = {user_id for user_id in user_ids if is_id(user_id)}
+        existing = set(db.session.scalars(select(User.id).where(User.id.in_(valid_ids))))
+        already_pending = set(db.session.scalars(
+            select(GroupInvitation.invited_user_id).where(
+                GroupInvitation.group_id == group.id,
+                GroupInvitation.status == 'pending',
+                GroupInvitation.invited_user_id.in_(existing),
+            )
+        ))
+        already_members = members_among(group.id, existing)
+
+        results, to_invite, seen = [], [], set()
+        for user_id in user_ids:
+            if not is_id(user_id):
+                results.append({"invited_user_id": user_id, "status": "invalid"})
+                continue
+            if user_id in seen:
+                results.append({"invited_user_id": user_id, "status": "duplicate"})
+            elif user_id not in existing:
+                results.append({"invited_user_id": user_id, "status": "not_found"})
+            elif user_id in already_members:
+                results.append({"invited_user_id": user_id, "status": "already_member"})
+            elif user_id in already_pending:
+                results.append({"invited_user_id": user_id, "status": "already_invited"})
+            else:
+                results.append({"invited_user_id": user_id, "status": "invited"})
+                to_invite.append(user_id)
+            seen.add(user_id)
+
+        new_ids = iter(insert_returning_ids(GroupInvitation, [
+            {'group_id': group.id, 'user_id': current_user_id, 'invited_user_id': user_id, 'status': 'pending'}
+            for user_id in to_invite
+        ]))
+        db.session.commit()
+        for result in results:
+            if result["status"] == "invited":
+                result["invitation_id"] = next(new_ids)
+        return {"message": f"{len(to_invite)} invitations sent", "results": results}, 201
 
 class GroupInvitations(Resource):
     @jwt_required()
     def get(self):
-        current_user_id = get_jwt_identity()
-        invitations = GroupInvitation.query.filter_by(invited_user_id=current_user_id, status='pending').all()
+        current_user_id = jwt_user_id()
+        invitations = GroupInvitation.query.options(*INVITATION_LOADERS).filter_by(invited_user_id=current_user_id, status='pending').all()
         
         serialized_invitations = [
             {
                 'id': invite.id,
-                'group': invite.group.to_dict(),
-                'inviter': invite.inviter.to_dict()
+                'group': invite.group.serialize(),
+                'inviter': invite.inviter.serialize()
             }
             for invite in invitations
         ]
         return serialized_invitations, 200
 
 class DenyGroupInvitation(Resource):
+    @limited('write')
     @jwt_required()
     def put(self, invitation_id):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         invitation = GroupInvitation.query.get_or_404(invitation_id)
 
-        if str(invitation.invited_user_id) != str(current_user_id):
+        if invitation.invited_user_id != current_user_id:
             return {"message": "You do not have permission to deny this invitation"}, 403
 
         invitation.status = 'denied'
         db.session.commit()
-        return {"message": "Invitation denied", "invitation": invitation.to_dict()}, 200
+        return {"message": "Invitation denied", "invitation": invitation.serialize()}, 200
 
 class AcceptGroupInvitation(Resource):
+    @limited('write')
     @jwt_required()
     def put(self, invitation_id):
-        current_user_id = get_jwt_identity()
-        invitation = GroupInvitation.query.get_or_404(invitation_id)
+        current_user_id = jwt_user_id()
+        # The group comes back None if it has been deleted
+        invitation = GroupInvitation.query.options(joinedload(GroupInvitation.group)).get_or_404(invitation_id)
         
-        if str(invitation.invited_user_id) != str(current_user_id):
+        if invitation.invited_user_id != current_user_id:
             return {"message": "You do not have permission to accept this invitation"}, 403
+        if invitation.group is None:
+            return {"message": "Group not found"}, 404
 
+        # Status, membership, member_count and the feed backfill commit together
         invitation.status = 'accepted'
-
-        user = User.query.get_or_404(current_user_id)
-        group = Group.query.get_or_404(invitation.group_id)
-        user.add_group(group)
+        group_id = invitation.group_id
+        if add_members(group_id, [current_user_id]):
+            queue_backfill(db.session, current_user_id, group_id)
 
         db.session.commit()
-        return {"message": "Invitation accepted", "invitation": invitation.to_dict()}, 200
+        invalidate('groups', f"group:{group_id}")
+        return {"message": "Invitation accepted", "invitation": invitation.serialize()}, 200
 
 # RSVP Resources
 class RSVPList(Resource):
+    @limited('write')
     @jwt_required()
     def post(self):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         data = request.get_json()
 
         if not all(k in data for k in ("event_id", "status")):
             return {"message": "Missing required fields"}, 400
+        if data['status'] not in RSVP_STATUSES:
+            return {"message": f"status must be one of {', '.join(RSVP_STATUSES)}"}, 400
+
+        Event.query.get_or_404(data['event_id'])
+        # Re-RSVPing changes the existing row's status instead of adding one
+        rsvp, = upsert_rsvps([{
+            'user_id': current_user_id,
+            'event_id': data['event_id'],
+            'status': data['status'],
+        }])
+        db.session.commit()
+        invalidate('events', f"event:{rsvp.event_id}", f"event:{rsvp.event_id}:rsvps")
+        return {"message": "RSVP saved successfully", "rsvp": rsvp.serialize()}, 201
 
-        new_rsvp = RSVP(
-            user_id=current_user_id,
-            event_id=data['event_id'],
-            status=data['status']
-        )
-        db.session.add(new_rsvp)
+class RSVPBatch(Resource):
+    @limited('write')
+    @jwt_required()
+    def post(self):
+        # {"rsvps": [{"event_id": 1, "status": "going"}, ...]} for the current user
+        current_user_id = jwt_user_id()
+        items, error = batch_items(request.get_json(), 'rsvps')
+        if error:
+            return error
+
+        event_ids = {item['event_id'] for item in items if has_event_id(item)}
+        existing = set(db.session.scalars(select(Event.id).where(Event.id.in_(event_ids))))
+
+        results, rows = [], []
+        for item in items:
+            if not has_event_id(item) or item.get('status') not in RSVP_STATUSES:
+                results.append({"item": item, "status": "invalid"})
+            elif item['event_id'] not in existing:
+                results.append({"event_id": item['event_id'], "status": "not_found"})
+            else:
+                results.append({"event_id": item['event_id'], "status": "saved"})
+                rows.append({'user_id': current_user_id, 'event_id': item['event_id'], 'status': item['status']})
+
+        rsvp_ids = {rsvp.event_id: rsvp.id for rsvp in upsert_rsvps(rows)}
         db.session.commit()
-        return {"message": "RSVP created successfully", "rsvp": new_rsvp.to_dict()}, 201
+        invalidate('events', *(tag for event_id in rsvp_ids for tag in (f"event:{event_id}", f"event:{event_id}:rsvps")))
+        for result in results:
+            if result["status"] == "saved":
+                result["rsvp_id"] = rsvp_ids[result["event_id"]]
+        return {"message": f"{len(rsvp_ids)} RSVPs saved", "results": results}, 201
 
 class EventRSVPs(Resource):
+    @limited('heavy')
+    @cached('event:{event_id}:rsvps')
     def get(self, event_id):
-        rsvps = RSVP.query.filter_by(event_id=event_id).all()
-        return [rsvp.to_dict() for rsvp in rsvps], 200
+        fmt = stream_format()
+        if fmt:
+            return stream(RSVP.query.filter_by(event_id=event_id), [RSVP.id], fmt)
+
+        limit, after = page_args(default_limit=MAX_PAGE_SIZE)
+        rsvps, next_cursor = paginate(RSVP.query.filter_by(event_id=event_id), [RSVP.id], limit, after)
+        return [rsvp.serialize() for rsvp in rsvps], 200, page_headers(next_cursor)
 
 # Comment Resources
 class CommentList(Resource):
+    @limited('write')
     @jwt_required()
     def post(self, event_id):
-        current_user_id = get_jwt_identity()
+        current_user_id = jwt_user_id()
         data = request.get_json()
+        Event.query.get_or_404(event_id)
         new_comment = Comment(
             content=data['content'],
             user_id=current_user_id,
             event_id=event_id
         )
         db.session.add(new_comment)
+        comments_added(event_id)
+        db.session.flush()
+        queue_publish(db.session, [activity(current_user_id, 'comment', event_id, new_comment.id)])
         db.session.commit()
-        return {"message": "Comment added successfully", "comment": new_comment.to_dict()}, 201
+        invalidate('events', f"event:{event_id}", f"event:{event_id}:comments")
+        return {"message": "Comment added successfully", "comment": new_comment.serialize()}, 201
+
+class CommentBatch(Resource):
+    @limited('write')
+    @jwt_required()
+    def post(self):
+        # {"comments": [{"event_id": 1, "content": "..."}, ...]} for the current user
+        current_user_id = jwt_user_id()
+        items, error = batch_items(request.get_json(), 'comments')
+        if error:
+            return error
+
+        event_ids = {item['event_id'] for item in items if has_event_id(item)}
+        existing = set(db.session.scalars(select(Event.id).where(Event.id.in_(event_ids))))
+
+        results, rows, counts_by_event = [], [], {}
+        for item in items:
+            if not has_event_id(item) or not isinstance(item.get('content'), str) or not item['content']:
+                results.append({"item": item, "status": "invalid"})
+            elif item['event_id'] not in existing:
+                results.append({"event_id": item['event_id'], "status": "not_found"})
+            else:
+                results.append({"event_id": item['event_id'], "status": "created"})
+                rows.append({'user_id': current_user_id, 'event_id': item['event_id'], 'content': item['content']})
+                counts_by_event[item['event_id']] = counts_by_event.get(item['event_id'], 0) + 1
+
+        new_ids = insert_returning_ids(Comment, rows)
+        comments_added_many(counts_by_event)
+        queue_publish(db.session, [
+            activity(current_user_id, 'comment', row['event_id'], comment_id) for row, comment_id in zip(rows, new_ids)
+        ])
+        new_ids = iter(new_ids)
+        db.session.commit()
+        invalidate('events', *(tag for event_id in counts_by_event for tag in (f"event:{event_id}", f"event:{event_id}:comments")))
+        for result in results:
+            if result["status"] == "created":
+                result["comment_id"] = next(new_ids)
+        return {"message": f"{len(rows)} comments created", "results": results}, 201
 
 class EventComments(Resource):
+    @limited('heavy')
+    @cached('event:{event_id}:comments')
     def get(self, event_id):
-        comments = Comment.query.filter_by(event_id=event_id).all()
-        return [comment.to_dict() for comment in comments], 200
+        fmt = stream_format()
+        if fmt:
+            return stream(Comment.query.filter_by(event_id=event_id), [Comment.id], fmt)
+
+        limit, after = page_args(default_limit=MAX_PAGE_SIZE)
+        comments, next_cursor = paginate(Comment.query.filter_by(event_id=event_id), [Comment.id], limit, after)
+        return [comment.serialize() for comment in comments], 200, page_headers(next_cursor)
 
 # Add the resources to the API
 api.add_resource(Register, '/register')
@@ -377,18 +711,30 @@ api.add_resource(Logout, '/logout')
 api.add_resource(UserList, '/users')  # Updated to support search
 api.add_resource(UserProfile, '/profile', '/profile/<int:user_id>')
 api.add_resource(EventList, '/events')  # Updated to support search
+api.add_resource(UpcomingEvents, '/events/upcoming')
+api.add_resource(Feed, '/feed')
 api.add_resource(EventDetail, '/events/<int:event_id>')
 api.add_resource(GroupList, '/groups')  # Updated to support search
 api.add_resource(GroupDetail, '/groups/<int:group_id>')
+api.add_resource(GroupMembers, '/groups/<int:group_id>/members')
 api.add_resource(GroupInvite, '/groups/<int:group_id>/invite')
 api.add_resource(GroupInvitations, '/invitations')
 api.add_resource(RSVPList, '/rsvps')
+api.add_resource(RSVPBatch, '/rsvps/batch')
+api.add_resource(CommentBatch, '/comments/batch')
 api.add_resource(EventRSVPs, '/events/<int:event_id>/rsvps')
 api.add_resource(CommentList, '/events/<int:event_id>/comments')
 api.add_resource(EventComments, '/events/<int:event_id>/comments')
 api.add_resource(AcceptGroupInvitation, '/invitations/<int:invitation_id>/accept')
 api.add_resource(DenyGroupInvitation, '/invitations/<int:invitation_id>/deny')
 
+init_responses(app, api)
+init_purge(app)
+init_rate_limits(app)
+init_replicas(app, db)
+if app.config['INSTRUMENTATION_ENABLED']:
+    init_instrumentation(app, api, db)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 10000)))
 
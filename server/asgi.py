@@ -0,0 +1,378 @@
+# Async (ASGI) entry point. The hot endpoints below run on an event loop with
+# SQLAlchemy's AsyncSession (aiosqlite or asyncpg), so a slow query or bcrypt
+# check parks a coroutine instead of a whole worker thread. Every other route
+# falls through to the Flask app from app.py, mounted as WSGI, so the API is
+# the same whichever entry point serves it.
+#
+#   uvicorn asgi:application --workers 4
+#   python asgi.py
+#
+# Needs starlette, uvicorn, a2wsgi and aiosqlite (asyncpg for PostgreSQL).
+# Responses here skip the response cache in cache.py but still invalidate it,
+# so cached GETs served by the Flask side stay correct.
+from contextlib import asynccontextmanager
+from datetime import datetime
+import os
+
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError
+from sqlalchemy import event, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest, HTTPException as WerkzeugHTTPException
+
+from app import app as flask_app, register_response, login_response, unset_jwt
+from cache import invalidate
+from identity import forget_user
+from config import apply_sqlite_pragmas, engine_options
+from models import User, Event, Group, Comment, RSVP, GROUP_LOADERS, RSVP_LOADERS
+from pagination import MAX_PAGE_SIZE, page_args, paginate, page_headers
+from passwords import hasher, HasherBusy
+from ratelimit import ConcurrencyCap, admit, busy, too_many
+from search import search
+from event_filters import list_events as query_events
+from feed import activity, queue_publish
+from streaming import stream_format
+
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+
+
+def async_engine_options(url):
+    # Same pool settings as the sync engine; asyncpg takes server settings
+    # directly instead of a libpq options string
+    options = engine_options(str(url))
+    timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if url.get_backend_name() == 'postgresql':
+        options.pop('connect_args', None)
+        if timeout:
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(timeout)}}
+    return options
+
+
+def create_engine_for(sync_url):
+    url = make_url(sync_url)
+    url = url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}")
+    engine = create_async_engine(url, **async_engine_options(url))
+    if url.get_backend_name() == 'sqlite':
+        # The sync hook in config.py only recognises sqlite3 connections
+        event.listen(engine.sync_engine, 'connect', lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection))
+    return engine
+
+
+wsgi = WSGIMiddleware(flask_app)
+engine = create_engine_for(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def json_response(data, status=200, headers=None):
+    # Same encoder as the Flask side (responses.py)
+    return Response(flask_app.json.dumps(data) + '\n', status_code=status, headers=headers,
+                    media_type='application/json')
+
+
+def from_flask(flask_response):
+    # Carries a Flask response (body, status and every Set-Cookie) across
+    response = Response(flask_response.get_data(), status_code=flask_response.status_code)
+    for name, value in flask_response.headers.items():
+        if name.lower() != 'content-length':
+            response.headers.append(name, value)
+    return response
+
+
+def wants_stream(request):
+    # Streaming (streaming.py) is served by the Flask side; an endpoint can
+    # hand the request over by returning the mounted app as its response
+    return stream_format(request.headers.get('accept', ''), request.query_params) is not None
+
+
+def current_user_id(request):
+    # Mirrors @jwt_required() for cookie tokens
+    token = request.cookies.get(flask_app.config['JWT_ACCESS_COOKIE_NAME'])
+    if not token:
+        raise HTTPException(401, f"Missing cookie \"{flask_app.config['JWT_ACCESS_COOKIE_NAME']}\"")
+    with flask_app.app_context():
+        # Same statuses as flask_jwt_extended's error handlers: 401 for an
+        # expired token, 422 for any other token it can't use
+        try:
+            claims = decode_token(token)
+        except ExpiredSignatureError:
+            raise HTTPException(401, "Token has expired")
+        except Exception as error:
+            raise HTTPException(422, str(error))
+    if claims.get('type') != 'access':
+        raise HTTPException(422, "Only non-refresh tokens are allowed")
+    return claims[flask_app.config['JWT_IDENTITY_CLAIM']]
+
+
+def limited(limit_class, endpoint):
+    # ratelimit.limited() for the async routes. Behind a proxy, run uvicorn
+    # with --proxy-headers so request.client is the real client.
+    cap = ConcurrencyCap(flask_app.config['CONCURRENCY_LIMITS'].get(limit_class, 0))
+
+    async def wrapper(request):
+        client = f"ip:{request.client.host if request.client else ''}"
+        if limit_class != 'auth' and flask_app.config['JWT_ACCESS_COOKIE_NAME'] in request.cookies:
+            try:
+                client = f"user:{current_user_id(request)}"
+            except HTTPException:
+                pass
+        retry_after = admit(limit_class, client)
+        if retry_after is not None:
+            return json_response(*too_many(retry_after))
+        if not cap.enter():
+            return json_response(*busy())
+        try:
+            return await endpoint(request)
+        finally:
+            cap.exit()
+    return wrapper
+
+
+def next_page_headers(request, next_cursor):
+    return page_headers(next_cursor, str(request.url.replace(query='')), request.query_params)
+
+
+async def json_body(request):
+    # A malformed body is a 400, as request.get_json() makes it on the Flask
+    # side; anything but an object is missing every field
+    try:
+        data = await request.json()
+    except ValueError:
+        raise BadRequest()
+    return data if isinstance(data, dict) else {}
+
+
+async def register(request):
+    data = await json_body(request)
+    if not all(k in data for k in ("username", "email", "password")):
+        return json_response({"message": "Missing required fields"}, 400)
+
+    async with Session() as session:
+        taken = (await session.execute(
+            select(User.username, User.email)
+            .where(or_(User.username == data['username'], User.email == data['email']))
+        )).all()
+        if any(row.username == data['username'] for row in taken):
+            return json_response({"message": "Username already exists"}, 400)
+        if taken:
+            return json_response({"message": "Email already registered"}, 400)
+
+        try:
+            password_hash = await hasher.hash_async(data['password'])
+        except HasherBusy:
+            return json_response({"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"})
+        user = User(username=data['username'], email=data['email'], password_hash=password_hash)
+        session.add(user)
+        await session.commit()
+
+    with flask_app.app_context():
+        return from_flask(register_response(user))
+
+
+async def login(request):
+    data = await json_body(request)
+    if not all(k in data for k in ("username", "password")):
+        return json_response({"message": "Missing required fields"}, 400)
+
+    async with Session() as session:
+        user = await session.scalar(select(User).where(User.username == data['username']))
+        try:
+            if user is None or not await hasher.verify_async(data['password'], user.password_hash):
+                return json_response({"message": "Invalid username or password"}, 401)
+        except HasherBusy:
+            return json_response({"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"})
+
+        # Upgrade hashes made with a different BCRYPT_ROUNDS; best effort,
+        # as in app.py
+        if hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = await hasher.hash_async(data['password'])
+                await session.commit()
+            except HasherBusy:
+                pass
+
+    with flask_app.app_context():
+        return from_flask(login_response(user.id))
+
+
+async def logout(request):
+    forget_user(current_user_id(request))
+    with flask_app.app_context():
+        return from_flask(unset_jwt())
+
+
+async def list_events(request):
+    if wants_stream(request):
+        return wsgi
+    limit, after = page_args(args=request.query_params)
+
+    def load(session):
+        return query_events(session.query(Event), request.query_params, limit, after)
+
+    async with Session() as session:
+        events, next_cursor = await session.run_sync(load)
+        data = [event.serialize() for event in events]
+    return json_response(data, 200, next_page_headers(request, next_cursor))
+
+
+async def create_event(request):
+    user_id = current_user_id(request)
+    data = await json_body(request)
+
+    if not all(k in data for k in ("name", "date", "location", "description")):
+        return json_response({"message": "Missing required fields"}, 400)
+
+    try:
+        event_date = datetime.strptime(data['date'], "%Y-%m-%dT%H:%M")
+    except ValueError:
+        return json_response({"message": "Invalid date format, expected YYYY-MM-DDTHH:MM"}, 400)
+
+    async with Session() as session:
+        new_event = Event(
+            name=data['name'],
+            date=event_date,
+            location=data['location'],
+            description=data['description'],
+            user_id=int(user_id)
+        )
+        session.add(new_event)
+        await session.flush()
+        await session.run_sync(lambda session: queue_publish(session, [activity(new_event.user_id, 'event', new_event.id)]))
+        await session.commit()
+    invalidate('events')
+    return json_response({"message": "Event created successfully", "event": new_event.serialize()}, 201)
+
+
+async def event_detail(request):
+    event_id = request.path_params['event_id']
+    async with Session() as session:
+        event = await session.get(Event, event_id)
+        if event is None:
+            raise HTTPException(404)
+        rsvps = await session.scalars(select(RSVP).options(*RSVP_LOADERS).where(RSVP.event_id == event_id))
+        event_data = event.serialize()
+        event_data['rsvps'] = [
+            {
+                'user_id': rsvp.user.id,
+                'username': rsvp.user.username,
+                'status': rsvp.status
+            }
+            for rsvp in rsvps
+        ]
+    return json_response(event_data)
+
+
+async def list_groups(request):
+    if wants_stream(request):
+        return wsgi
+    limit, after = page_args(args=request.query_params)
+    query = request.query_params.get('q', '')
+
+    def load(session):
+        groups = session.query(Group).options(*GROUP_LOADERS)
+        if query:
+            return search(groups, Group, query, limit, after)
+        return paginate(groups, [Group.id], limit, after)
+
+    async with Session() as session:
+        groups, next_cursor = await session.run_sync(load)
+        data = [group.serialize() for group in groups]
+    return json_response(data, 200, next_page_headers(request, next_cursor))
+
+
+async def group_detail(request):
+    async with Session() as session:
+        group = await session.get(Group, request.path_params['group_id'], options=GROUP_LOADERS)
+        if group is None:
+            raise HTTPException(404)
+        data = {
+            'id': group.id,
+            'name': group.name,
+            'description': group.description,
+            'user_id': group.user_id,
+            'members': [{'id': user.id, 'username': user.username} for user in group.members]
+        }
+    return json_response(data)
+
+
+async def event_comments(request):
+    if wants_stream(request):
+        return wsgi
+    event_id = request.path_params['event_id']
+    limit, after = page_args(default_limit=MAX_PAGE_SIZE, args=request.query_params)
+    async with Session() as session:
+        comments, next_cursor = await session.run_sync(
+            lambda session: paginate(session.query(Comment).filter_by(event_id=event_id), [Comment.id], limit, after)
+        )
+        data = [comment.serialize() for comment in comments]
+    return json_response(data, 200, next_page_headers(request, next_cursor))
+
+
+async def http_error(request, error):
+    # 404s, auth failures and the 400s raised by flask_restful.abort in
+    # pagination.py, shaped like the Flask side's responses
+    if isinstance(error, WerkzeugHTTPException):
+        data = getattr(error, 'data', None) or {"message": error.description}
+        return json_response(data, error.code)
+    if error.status_code in (401, 422):
+        return json_response({"msg": error.detail}, error.status_code)
+    return json_response({"message": error.detail}, error.status_code)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    yield
+    await engine.dispose()
+
+
+# Flask-CORS and responses.py only cover the mounted app (including every
+# preflight, since OPTIONS falls through), so the async routes add CORS
+# headers and compression themselves. Starlette's middleware is gzip only.
+route_middleware = [Middleware(
+    CORSMiddleware,
+    allow_origins=flask_app.config['CORS_ORIGINS'],
+    allow_credentials=flask_app.config['CORS_SUPPORTS_CREDENTIALS'],
+    expose_headers=flask_app.config['CORS_EXPOSE_HEADERS'],
+)]
+if flask_app.config['COMPRESS_RESPONSES']:
+    route_middleware.append(Middleware(
+        GZipMiddleware,
+        minimum_size=flask_app.config['COMPRESS_MIN_SIZE'],
+        compresslevel=flask_app.config['COMPRESS_GZIP_LEVEL'],
+    ))
+
+
+def route(path, endpoint, method):
+    return Route(path, endpoint, methods=[method], middleware=route_middleware)
+
+
+application = Starlette(
+    routes=[
+        route('/register', limited('auth', register), 'POST'),
+        route('/login', limited('auth', login), 'POST'),
+        route('/logout', logout, 'POST'),
+        route('/events', list_events, 'GET'),
+        route('/events', limited('write', create_event), 'POST'),
+        route('/events/{event_id:int}', event_detail, 'GET'),
+        route('/groups', list_groups, 'GET'),
+        route('/groups/{group_id:int}', group_detail, 'GET'),
+        route('/events/{event_id:int}/comments', limited('heavy', event_comments), 'GET'),
+        # Everything else, and other methods on the paths above
+        Mount('/', app=wsgi),
+    ],
+    exception_handlers={HTTPException: http_error, WerkzeugHTTPException: http_error},
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=int(os.getenv('PORT', 10000)))
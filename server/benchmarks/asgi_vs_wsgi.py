@@ -0,0 +1,121 @@
+# Side-by-side load test of the two entry points: gunicorn serving app.py
+# (sync workers with threads) and uvicorn serving asgi.py. Both run against
+# the same seeded scratch database with the response cache off, and an
+# asyncio load generator holds N connections open against each in turn,
+# reporting throughput, p50/p99 latency and errors per concurrency level.
+#
+#   python -m benchmarks.asgi_vs_wsgi --concurrency 10 100 1000 --duration 10
+#   python -m benchmarks.asgi_vs_wsgi --workers 4 --threads 8 --login-every 20
+#
+# Needs httpx for the load generator, plus gunicorn and uvicorn.
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.harness import use_scratch_database, percentile, free_port, start_server
+
+DATABASE_PATH = use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+
+
+def seed(options):
+    from seed import seed_all, SEED_PASSWORD
+    from config import app, db
+    from models import User
+
+    seed_all(argparse.Namespace(
+        users=options.users, groups=options.groups, events=options.events, rsvps=options.events,
+        comments=options.events, memberships=options.groups * 5, invitations=0,
+        batch_size=5000, seed=0, workers=0, progress=False,
+    ))
+    with app.app_context():
+        username = db.session.scalar(db.select(User.username).where(User.id == 1))
+        db.session.remove()
+        db.engine.dispose()
+    return username, SEED_PASSWORD
+
+
+def server_commands(options, port):
+    bind = f"127.0.0.1:{port}"
+    return {
+        'wsgi': [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', bind, '--workers', str(options.workers),
+                 '--threads', str(options.threads), '--backlog', '4096', '--log-level', 'warning'],
+        'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(port),
+                 '--workers', str(options.workers), '--backlog', '4096', '--log-level', 'warning', '--no-access-log'],
+    }
+
+
+def next_request(options, credentials, n):
+    # A read-heavy mix, with a bcrypt-bound login every --login-every requests
+    if options.login_every and n % options.login_every == 0:
+        return 'POST', '/login', {'username': credentials[0], 'password': credentials[1]}
+    pick = n % 3
+    if pick == 0:
+        return 'GET', '/events?limit=30', None
+    if pick == 1:
+        return 'GET', f"/events/{random.randint(1, options.events)}", None
+    return 'GET', f"/groups/{random.randint(1, options.groups)}", None
+
+
+async def drive(base_url, options, credentials, concurrency):
+    latencies, errors, counter = [], 0, iter(range(10 ** 12))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=options.timeout) as client:
+        deadline = time.monotonic() + options.duration
+
+        async def connection():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                method, path, body = next_request(options, credentials, next(counter))
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(connection() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--duration', type=float, default=10, help='seconds per server and concurrency level')
+    parser.add_argument('--workers', type=int, default=2, help='processes for both servers')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--login-every', type=int, default=0, help='make every Nth request a login (0 = none)')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--events', type=int, default=5000)
+    options = parser.parse_args()
+
+    credentials = seed(options)
+    print(f"{'server':<6} {'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    port = free_port()
+    for name, command in server_commands(options, port).items():
+        base_url = f"http://127.0.0.1:{port}"
+        process = start_server(command, base_url)
+        try:
+            for concurrency in options.concurrency:
+                rps, p50, p99, errors = asyncio.run(drive(base_url, options, credentials, concurrency))
+                print(f"{name:<6} {concurrency:>6} {rps:>9.0f} {p50:>9.1f} {p99:>9.1f} {errors:>7}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
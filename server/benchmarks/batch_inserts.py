@@ -0,0 +1,94 @@
+# Compares creating N RSVPs, comments and invitations one request at a time
+# against the batch endpoints, reporting rows/sec and statements per row.
+#
+#   python -m benchmarks.batch_inserts --items 500
+import argparse
+import time
+from datetime import datetime
+
+from benchmarks.harness import use_scratch_database, count_queries, login
+
+use_scratch_database()
+
+from app import app, MAX_BATCH_SIZE  # noqa: E402
+from config import db  # noqa: E402
+from models import User, Event, Group  # noqa: E402
+
+PASSWORD = 'batch-password'
+
+
+def seed(items):
+    with app.app_context():
+        db.create_all()
+        users = [User(username=f"batch{i}", email=f"batch{i}@example.com") for i in range(items * 2 + 1)]
+        for user in users:
+            user.password = PASSWORD
+        db.session.add_all(users)
+        db.session.flush()
+        owner = users[0]
+        db.session.add_all([
+            Event(name=f"event {i}", date=datetime(2024, 1, 1), location='Somewhere',
+                  description='Description', user_id=owner.id)
+            for i in range(items)
+        ])
+        db.session.add_all([Group(name='single', description='d', user_id=owner.id),
+                            Group(name='batch', description='d', user_id=owner.id)])
+        db.session.commit()
+        return [user.id for user in users[1:]]
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def run(client, label, calls, rows):
+    with app.app_context(), count_queries() as statements:
+        started = time.perf_counter()
+        for method, path, body in calls:
+            response = client.open(path, method=method, json=body)
+            if response.status_code != 201:
+                raise RuntimeError(f"{label}: {path} returned {response.status_code}")
+        elapsed = time.perf_counter() - started
+    print(f"{label:<22} {rows:>6} rows  {rows / elapsed:>9.0f} rows/s  "
+          f"{len(statements) / rows:>6.2f} statements/row")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=500)
+    options = parser.parse_args()
+
+    user_ids = seed(options.items)
+    client = app.test_client()
+    login(client, 'batch0', PASSWORD)
+    event_ids = list(range(1, options.items + 1))
+    half = len(user_ids) // 2
+
+    run(client, 'rsvps single', [
+        ('POST', '/rsvps', {'event_id': event_id, 'status': 'going'}) for event_id in event_ids
+    ], options.items)
+    run(client, 'rsvps batch', [
+        ('POST', '/rsvps/batch', {'rsvps': [{'event_id': event_id, 'status': 'maybe'} for event_id in chunk]})
+        for chunk in chunks(event_ids, MAX_BATCH_SIZE)
+    ], options.items)
+
+    run(client, 'comments single', [
+        ('POST', f"/events/{event_id}/comments", {'content': 'hello'}) for event_id in event_ids
+    ], options.items)
+    run(client, 'comments batch', [
+        ('POST', '/comments/batch', {'comments': [{'event_id': event_id, 'content': 'hello'} for event_id in chunk]})
+        for chunk in chunks(event_ids, MAX_BATCH_SIZE)
+    ], options.items)
+
+    run(client, 'invitations single', [
+        ('POST', '/groups/1/invite', {'group_id': 1, 'invited_user_id': user_id}) for user_id in user_ids[:half]
+    ], half)
+    run(client, 'invitations batch', [
+        ('POST', '/groups/2/invite', {'invited_user_ids': chunk})
+        for chunk in chunks(user_ids[half:], MAX_BATCH_SIZE)
+    ], len(user_ids) - half)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# DELETE /events/<id> latency for an event with many comments, RSVPs and
+# feed rows under both DELETE_MODEs in purge.py: cascade (one DELETE, the
+# database removes the children) and background (the request stamps
+# deleted_at; the purge runs separately in PURGE_BATCH_SIZE batches, timed
+# here along with its longest single transaction).
+#
+#   python -m benchmarks.delete_latency --children 200000 --batch-size 1000
+import argparse
+from datetime import datetime
+import os
+import time
+
+from benchmarks.harness import use_scratch_database, login
+
+use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['PURGE_INTERVAL'] = '3600'
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from models import User, Event, Comment, RSVP, FeedItem  # noqa: E402
+from purge import purge_deleted  # noqa: E402
+import purge  # noqa: E402
+from seed import seed_all, SEED_PASSWORD  # noqa: E402
+
+
+def add_big_event(host_id, children):
+    # One event with `children` comments, RSVPs and feed rows
+    event_row = Event(name='big', date=datetime(2030, 1, 1), location='here', description='big', user_id=host_id)
+    db.session.add(event_row)
+    db.session.flush()
+    user_ids = db.session.scalars(db.select(User.id).limit(children)).all()
+    db.session.execute(db.insert(Comment), [
+        {'content': 'hi', 'user_id': host_id, 'event_id': event_row.id} for _ in range(children)
+    ])
+    db.session.execute(db.insert(RSVP), [
+        {'user_id': user_id, 'event_id': event_row.id, 'status': 'going'} for user_id in user_ids
+    ])
+    db.session.execute(db.insert(FeedItem), [
+        {'user_id': user_id, 'actor_id': host_id, 'kind': 'event', 'event_id': event_row.id} for user_id in user_ids
+    ])
+    db.session.commit()
+    return event_row.id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--children', type=int, default=50000, help='comments, and RSVPs and feed rows (one per user)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    options = parser.parse_args()
+
+    seed_all(argparse.Namespace(
+        users=options.children, groups=0, events=0, rsvps=0, comments=0, memberships=0, invitations=0,
+        batch_size=20000, seed=0, workers=0, progress=False,
+    ))
+    with app.app_context():
+        username = db.session.scalar(db.select(User.username).where(User.id == 1))
+    client = app.test_client()
+    login(client, username, SEED_PASSWORD)
+    # The purger thread stays asleep; the purge is run and timed below
+    purge._wakeup.set = lambda: None
+
+    print(f"{'mode':<12} {'request ms':>11} {'purge ms':>10} {'longest txn ms':>15}")
+    for mode in ('cascade', 'background'):
+        app.config['DELETE_MODE'] = mode
+        with app.app_context():
+            event_id = add_big_event(1, options.children)
+
+        started = time.perf_counter()
+        response = client.delete(f"/events/{event_id}")
+        request_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.get_json()
+
+        purge_ms = longest = 0.0
+        if mode == 'background':
+            commits = [time.perf_counter()]
+            with app.app_context():
+                listener = lambda session: commits.append(time.perf_counter())  # noqa: E731
+                event.listen(db.session, 'after_commit', listener)
+                purge_deleted(options.batch_size)
+                event.remove(db.session, 'after_commit', listener)
+            purge_ms = (commits[-1] - commits[0]) * 1000
+            longest = max((b - a) * 1000 for a, b in zip(commits, commits[1:]))
+        print(f"{mode:<12} {request_ms:>11.1f} {purge_ms:>10.1f} {longest if mode == 'background' else request_ms:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
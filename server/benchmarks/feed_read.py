@@ -0,0 +1,107 @@
+# GET /feed latency on a large seeded database under the fan-out settings in
+# feed.py: everything fanned out on write, everything read from per-group
+# rows, and (when group sizes differ) a split at --threshold members. For
+# each, feed_items
+# is rebuilt from the newest --recent events and comments, then sampled
+# users read their first page and a page --depth pages in. The rebuild rate
+# is the write-side cost of the same setting.
+#
+#   python -m benchmarks.feed_read --events 1000000 --recent 10000
+#   python -m benchmarks.feed_read --events 100000 --users 2000 --threshold 50
+import argparse
+import os
+import random
+import time
+
+from benchmarks.harness import use_scratch_database, login, percentile
+
+use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from feed import rebuild_feed  # noqa: E402
+from models import User, Group, FeedItem  # noqa: E402
+from seed import seed_all, SEED_PASSWORD  # noqa: E402
+
+
+def read_pages(client, limit, depth):
+    # Latency of the first page and of page `depth`, following cursors
+    started = time.perf_counter()
+    response = client.get(f"/feed?limit={limit}")
+    first = (time.perf_counter() - started) * 1000
+    deep = None
+    for _ in range(depth - 1):
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return first, None
+        started = time.perf_counter()
+        response = client.get(f"/feed?limit={limit}&after={cursor}")
+        deep = (time.perf_counter() - started) * 1000
+    return first, deep
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--memberships', type=int, default=20_000)
+    parser.add_argument('--recent', type=int, default=10_000, help='newest events and comments to publish')
+    parser.add_argument('--threshold', type=int, default=None, help='split point for the mixed run (default: median group size)')
+    parser.add_argument('--readers', type=int, default=20, help='sampled users')
+    parser.add_argument('--repeat', type=int, default=5, help='reads per user')
+    parser.add_argument('--limit', type=int, default=30)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    options = parser.parse_args()
+
+    seed_all(argparse.Namespace(
+        users=options.users, groups=options.groups, events=options.events, rsvps=0,
+        comments=options.events // 10, memberships=options.memberships, invitations=0,
+        batch_size=20000, seed=0, workers=options.workers, progress=False,
+    ))
+
+    random.seed(0)
+    with app.app_context():
+        sizes = sorted(db.session.scalars(db.select(Group.member_count)))
+        readers = db.session.scalars(
+            db.select(User.username).where(User.groups.any()).order_by(User.id)
+        ).all()
+    readers = random.sample(readers, min(options.readers, len(readers)))
+    threshold = options.threshold if options.threshold is not None else sizes[len(sizes) // 2]
+
+    clients = []
+    for username in readers:
+        client = app.test_client()
+        login(client, username, SEED_PASSWORD)
+        clients.append(client)
+
+    settings = [('on write', sizes[-1])]
+    if sizes[0] <= threshold < sizes[-1]:
+        settings.append((f"split at {threshold}", threshold))
+    settings.append(('on read', 0))
+    print(f"{len(readers)} readers, groups of {sizes[0]}-{sizes[-1]} members, {options.recent:,} newest events and comments")
+    print(f"{'fan-out':<16} {'rows':>10} {'publish/s':>10} {'p50 ms':>8} {'p99 ms':>8}"
+          f" {'deep p50':>9} {'deep p99':>9}")
+    for name, max_members in settings:
+        app.config['FEED_FANOUT_MAX_MEMBERS'] = max_members
+        with app.app_context():
+            started = time.perf_counter()
+            published = rebuild_feed(options.recent)
+            rate = published / (time.perf_counter() - started)
+            rows = db.session.scalar(db.select(db.func.count()).select_from(FeedItem))
+
+        first, deep = [], []
+        for _ in range(options.repeat):
+            for client in clients:
+                first_ms, deep_ms = read_pages(client, options.limit, options.depth)
+                first.append(first_ms)
+                if deep_ms is not None:
+                    deep.append(deep_ms)
+        print(f"{name:<16} {rows:>10,} {rate:>10,.0f} {percentile(first, 50):>8.2f} {percentile(first, 99):>8.2f}"
+              f" {percentile(deep, 50):>9.2f} {percentile(deep, 99):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Shared helpers for the scripts in this package. Run them from the server
+# directory, e.g. `python -m benchmarks.query_budget`.
+from contextlib import contextmanager
+import atexit
+import os
+import socket
+import subprocess
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_scratch_database(path=None):
+    # config.py builds the engine at import time, so this has to run before
+    # anything imports config/app/models.
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix='bench-', suffix='.db')
+        os.close(handle)
+        atexit.register(os.remove, path)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(path)}"
+    # Scripts log in and hammer endpoints far past the production limits;
+    # benchmarks.rate_limit turns admission control back on itself
+    os.environ.setdefault('RATE_LIMIT_BACKEND', 'none')
+    return path
+
+
+@contextmanager
+def count_queries():
+    from sqlalchemy import event
+    from config import db
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def login(client, username, password):
+    response = client.post('/login', json={'username': username, 'password': password})
+    if response.status_code != 200:
+        raise RuntimeError(f"login failed for {username}: {response.status_code}")
+    return response.get_json()['user']['id']
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, base_url, env=None):
+    # Starts a server process from the server directory and waits for it
+    # to answer; needs httpx
+    import httpx
+
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env=env or os.environ.copy())
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + '/', timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}: {' '.join(command)}")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"server did not start: {' '.join(command)}")
@@ -0,0 +1,166 @@
+# Seeds a large SQLite database and times the hot lookups before and after
+# the indexes declared in models.py exist.
+#
+#   python -m benchmarks.index_latency --rows 2000000
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select, text
+
+from benchmarks.harness import use_scratch_database
+
+use_scratch_database()
+
+from config import db  # noqa: E402
+import models  # noqa: E402,F401  (registers the tables on db.metadata)
+from seed import distinct_pair  # noqa: E402
+
+users = db.metadata.tables['users']
+events = db.metadata.tables['events']
+groups = db.metadata.tables['groups']
+comments = db.metadata.tables['comments']
+rsvps = db.metadata.tables['rsvps']
+invitations = db.metadata.tables['group_invitations']
+
+START = datetime(2024, 1, 1)
+STATUSES = ('going', 'maybe', 'not_going')
+INVITE_STATUSES = ('pending', 'accepted', 'declined')
+
+
+def insert_batches(conn, table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+
+
+def seed(engine, counts, batch_size):
+    rng = random.Random(42)
+    n_users, n_events, n_groups = counts['users'], counts['events'], counts['groups']
+    with engine.begin() as conn:
+        insert_batches(conn, users, (
+            {'id': i, 'username': f"user{i}", 'email': f"user{i}@example.com", 'password_hash': 'x'}
+            for i in range(1, n_users + 1)
+        ), batch_size)
+        insert_batches(conn, events, (
+            {'id': i, 'name': f"event {i}", 'date': START + timedelta(minutes=rng.randrange(525600)),
+             'location': 'Somewhere', 'description': 'Description', 'user_id': rng.randint(1, n_users)}
+            for i in range(1, n_events + 1)
+        ), batch_size)
+        insert_batches(conn, groups, (
+            {'id': i, 'name': f"group {i}", 'description': 'Description', 'user_id': rng.randint(1, n_users)}
+            for i in range(1, n_groups + 1)
+        ), batch_size)
+        insert_batches(conn, comments, (
+            {'content': 'Nice', 'user_id': rng.randint(1, n_users), 'event_id': rng.randint(1, n_events)}
+            for _ in range(counts['comments'])
+        ), batch_size)
+        # uq_rsvps_user_id_event_id allows one RSVP per user and event
+        insert_batches(conn, rsvps, (
+            {'user_id': user_id, 'event_id': event_id, 'status': rng.choice(STATUSES)}
+            for event_id, user_id in (distinct_pair(i, n_events, n_users) for i in range(counts['rsvps']))
+        ), batch_size)
+        insert_batches(conn, invitations, (
+            {'group_id': rng.randint(1, n_groups), 'user_id': rng.randint(1, n_users),
+             'invited_user_id': rng.randint(1, n_users), 'status': rng.choice(INVITE_STATUSES)}
+            for _ in range(counts['invitations'])
+        ), batch_size)
+
+
+def lookups(counts):
+    # (label, statement factory taking a Random) for the queries app.py runs
+    n_users, n_events = counts['users'], counts['events']
+    return [
+        ('GroupInvitations.get', lambda r: select(invitations).where(
+            invitations.c.invited_user_id == r.randint(1, n_users), invitations.c.status == 'pending')),
+        ('EventComments.get', lambda r: select(comments).where(comments.c.event_id == r.randint(1, n_events))),
+        ('EventRSVPs.get', lambda r: select(rsvps).where(rsvps.c.event_id == r.randint(1, n_events))),
+        ('RSVP by user+event', lambda r: select(rsvps).where(
+            rsvps.c.user_id == r.randint(1, n_users), rsvps.c.event_id == r.randint(1, n_events))),
+        ('events by user', lambda r: select(events).where(events.c.user_id == r.randint(1, n_users))),
+        ('groups by user', lambda r: select(groups).where(groups.c.user_id == r.randint(1, n_users))),
+        ('events in a week', lambda r: (lambda start: select(events).where(
+            events.c.date >= start, events.c.date < start + timedelta(days=7)))(
+            START + timedelta(days=r.randrange(358)))),
+    ]
+
+
+def time_lookups(engine, counts, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for label, make_statement in lookups(counts):
+            rng = random.Random(label)
+            samples = []
+            for _ in range(repeat):
+                statement = make_statement(rng)
+                started = time.perf_counter()
+                conn.execute(statement).fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[label] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time hot lookups with and without indexes')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='comments and rsvps each; other tables scale from it')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--db', help='SQLite file to build (default: a temporary file)')
+    args = parser.parse_args()
+
+    counts = {
+        'users': max(args.rows // 10, 1),
+        'events': max(args.rows // 10, 1),
+        'groups': max(args.rows // 100, 1),
+        'comments': args.rows,
+        'rsvps': args.rows,
+        'invitations': args.rows // 2,
+    }
+    # At most one RSVP per (user, event)
+    counts['rsvps'] = min(counts['rsvps'], counts['users'] * counts['events'])
+    path = args.db
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix='index-latency-', suffix='.db')
+        os.close(handle)
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+
+    db.metadata.create_all(engine)
+    indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+    for index in indexes:
+        index.drop(engine)
+
+    started = time.perf_counter()
+    seed(engine, counts, args.batch_size)
+    print(f"seeded {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s ({path})")
+
+    before = time_lookups(engine, counts, args.repeat)
+    started = time.perf_counter()
+    for index in indexes:
+        index.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+    print(f"built {len(indexes)} indexes in {time.perf_counter() - started:.1f}s")
+    after = time_lookups(engine, counts, args.repeat)
+
+    print(f"{'lookup':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label in before:
+        print(f"{label:<22} {before[label]:>10.3f} {after[label]:>10.3f} {before[label] / max(after[label], 1e-6):>7.0f}x")
+
+    engine.dispose()
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
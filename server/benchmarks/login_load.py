@@ -0,0 +1,123 @@
+# Floods /login from several threads while other threads read /events, and
+# reports login throughput next to read latency. Runs in-process against the
+# Flask test client (like one threaded gunicorn worker) or, with --url,
+# against a running server.
+#
+#   python -m benchmarks.login_load --login-threads 16 --read-threads 4
+#   BCRYPT_ROUNDS=10 python -m benchmarks.login_load
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from benchmarks.harness import use_scratch_database, percentile
+
+use_scratch_database()
+# Measure the database path for reads rather than cache hits
+os.environ.setdefault('CACHE_BACKEND', 'none')
+# This measures the bcrypt pool's back-pressure (503 from HasherBusy), so
+# the per-route cap in ratelimit.py is off too; with --url, start the
+# server with the same setting
+os.environ.setdefault('CONCURRENCY_LIMIT_AUTH', '0')
+
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from models import User, Event  # noqa: E402
+
+USERNAME = 'loadtest'
+PASSWORD = 'loadtest-password'
+
+
+def seed(events):
+    with app.app_context():
+        db.create_all()
+        user = User(username=USERNAME, email='loadtest@example.com')
+        user.password = PASSWORD
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([
+            Event(name=f"event {i}", date=datetime(2024, 1, 1), location='Somewhere',
+                  description='Description', user_id=user.id)
+            for i in range(events)
+        ])
+        db.session.commit()
+
+
+def make_caller(base_url):
+    # Returns call(method, path, body) -> status code
+    if base_url is None:
+        client = app.test_client()
+
+        def call(method, path, body=None):
+            return client.open(path, method=method, json=body).status_code
+        return call
+
+    def call(method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login flood vs. concurrent read latency')
+    parser.add_argument('--url', help='base URL of a running server; defaults to the in-process test client')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--read-threads', type=int, default=4)
+    parser.add_argument('--events', type=int, default=30)
+    args = parser.parse_args()
+
+    if args.url is None:
+        seed(args.events)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    logins = {'ok': 0, 'limited': 0, 'busy': 0, 'other': 0}
+    reads = []
+
+    def login_loop():
+        call = make_caller(args.url)
+        while not stop.is_set():
+            status = call('POST', '/login', {'username': USERNAME, 'password': PASSWORD})
+            key = {200: 'ok', 429: 'limited', 503: 'busy'}.get(status, 'other')
+            with lock:
+                logins[key] += 1
+
+    def read_loop():
+        call = make_caller(args.url)
+        while not stop.is_set():
+            started = time.perf_counter()
+            call('GET', '/events')
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                reads.append(elapsed)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(args.login_threads)]
+    threads += [threading.Thread(target=read_loop) for _ in range(args.read_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"bcrypt rounds {app.config['BCRYPT_ROUNDS']}, hash workers {app.config['PASSWORD_HASH_WORKERS']}, "
+          f"max pending {app.config['PASSWORD_HASH_MAX_PENDING']}")
+    print(f"logins/s ok {logins['ok'] / args.duration:.1f}  busy(503) {logins['busy'] / args.duration:.1f}  "
+          f"limited(429) {logins['limited'] / args.duration:.1f}  other {logins['other'] / args.duration:.1f}")
+    print(f"/events reads {len(reads)}  p50 {percentile(reads, 50):.1f}ms  p99 {percentile(reads, 99):.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Fails (exit 1) when a GET endpoint's SQL statement count grows with the
+# number of rows it returns, i.e. when an N+1 query pattern sneaks back in.
+#
+#   python -m benchmarks.query_budget
+import os
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.harness import use_scratch_database, count_queries, login
+
+use_scratch_database()
+# Measure the database work, not cache hits
+os.environ['CACHE_BACKEND'] = 'none'
+
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from models import User, Event, Group, RSVP, Comment, GroupInvitation  # noqa: E402
+
+PASSWORD = 'budget-password'
+SCALES = (2, 20)
+
+
+def seed(scale):
+    db.drop_all()
+    db.create_all()
+
+    probe = User(username='probe', email='probe@example.com')
+    probe.password = PASSWORD
+    db.session.add(probe)
+    db.session.flush()
+
+    others = []
+    for i in range(scale):
+        user = User(username=f"user{i}", email=f"user{i}@example.com", password_hash=probe.password_hash)
+        db.session.add(user)
+        others.append(user)
+    db.session.flush()
+
+    first_event = None
+    for i in range(scale):
+        event = Event(
+            name=f"event {i}",
+            date=datetime(2024, 1, 1) + timedelta(days=i),
+            location='Somewhere',
+            description='Description',
+            user_id=probe.id,
+        )
+        db.session.add(event)
+        db.session.flush()
+        first_event = first_event or event
+        db.session.add(RSVP(user_id=probe.id, event_id=event.id, status='going'))
+
+    for user in others:
+        db.session.add(RSVP(user_id=user.id, event_id=first_event.id, status='maybe'))
+        db.session.add(Comment(content='Nice', user_id=user.id, event_id=first_event.id))
+
+    first_group = None
+    for i in range(scale):
+        group = Group(name=f"group {i}", description='Description', user_id=others[i].id)
+        group.members.extend(others)
+        group.members.append(probe)
+        db.session.add(group)
+        db.session.flush()
+        first_group = first_group or group
+        db.session.add(GroupInvitation(group_id=group.id, user_id=others[i].id, invited_user_id=probe.id, status='pending'))
+
+    db.session.commit()
+    return probe.id, first_event.id, first_group.id
+
+
+def endpoints(probe_id, event_id, group_id):
+    return [
+        ('users', '/users'),
+        ('users search', '/users?q=user'),
+        ('own profile', '/profile'),
+        ('profile', f"/profile/{probe_id}"),
+        ('events', '/events'),
+        ('events search', '/events?q=event'),
+        ('event detail', f"/events/{event_id}"),
+        ('event rsvps', f"/events/{event_id}/rsvps"),
+        ('event comments', f"/events/{event_id}/comments"),
+        ('groups', '/groups'),
+        ('groups search', '/groups?q=group'),
+        ('group detail', f"/groups/{group_id}"),
+        ('group members', f"/groups/{group_id}/members?user_ids=" + ','.join(map(str, range(1, 501)))),
+        ('invitations', '/invitations'),
+    ]
+
+
+def measure(scale):
+    with app.app_context():
+        ids = seed(scale)
+    counts = {}
+    client = app.test_client()
+    login(client, 'probe', PASSWORD)
+    for label, url in endpoints(*ids):
+        with app.app_context():
+            with count_queries() as statements:
+                response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        counts[label] = len(statements)
+    return counts
+
+
+def main():
+    results = [measure(scale) for scale in SCALES]
+    failures = 0
+    print(f"{'endpoint':<16} " + ' '.join(f"{scale:>4}" for scale in SCALES))
+    for label in results[0]:
+        row = [result[label] for result in results]
+        status = 'ok' if len(set(row)) == 1 else 'GROWS'
+        failures += status != 'ok'
+        print(f"{label:<16} " + ' '.join(f"{n:>4}" for n in row) + f"  {status}")
+    if failures:
+        print(f"{failures} endpoint(s) issue more statements as rows grow")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
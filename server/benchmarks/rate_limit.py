@@ -0,0 +1,106 @@
+# Read latency under a login flood, with and without the limiter in
+# ratelimit.py. Starts gunicorn (several workers sharing the SQLite bucket
+# file) on a seeded scratch database and, for each setting, runs readers on
+# /events alone and then alongside connections flooding /login with a wrong
+# password from one IP. Reports read p50/p99 and what the flood got back.
+#
+#   python -m benchmarks.rate_limit --workers 4 --flood 64 --duration 10
+#
+# Needs httpx and gunicorn.
+import argparse
+import asyncio
+from collections import Counter
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import use_scratch_database, percentile, free_port, start_server
+
+use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+
+
+def seed(options):
+    from seed import seed_all
+    from config import app, db
+    from models import User
+
+    seed_all(argparse.Namespace(
+        users=100, groups=10, events=options.events, rsvps=0, comments=0, memberships=0, invitations=0,
+        batch_size=5000, seed=0, workers=0, progress=False,
+    ))
+    with app.app_context():
+        username = db.session.scalar(db.select(User.username).where(User.id == 1))
+        db.session.remove()
+        db.engine.dispose()
+    return username
+
+
+async def drive(base_url, options, username, flood):
+    reads, flood_statuses, flood_latencies = [], Counter(), []
+    limits = httpx.Limits(max_connections=options.readers + flood)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + options.duration
+
+        async def reader():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get('/events?limit=30')
+                if response.status_code == 200:
+                    reads.append((time.perf_counter() - started) * 1000)
+
+        async def flooder():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.post('/login', json={'username': username, 'password': 'wrong'})
+                flood_latencies.append((time.perf_counter() - started) * 1000)
+                flood_statuses[response.status_code] += 1
+
+        await asyncio.gather(*(reader() for _ in range(options.readers)), *(flooder() for _ in range(flood)))
+    return reads, flood_statuses, flood_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--flood', type=int, default=64, help='connections hammering /login')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--backends', nargs='+', default=['none', 'sqlite'], help='RATE_LIMIT_BACKEND values to compare')
+    options = parser.parse_args()
+
+    username = seed(options)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f"127.0.0.1:{port}",
+               '--workers', str(options.workers), '--threads', str(options.threads),
+               '--backlog', '4096', '--log-level', 'warning']
+
+    print(f"{'limiter':<8} {'flood':>6} {'read p50':>9} {'read p99':>9} {'reads/s':>8}  login responses/s (p50 ms)")
+    for backend in options.backends:
+        buckets = tempfile.NamedTemporaryFile(prefix='ratelimit-', suffix='.db', delete=False).name
+        env = dict(os.environ, RATE_LIMIT_BACKEND=backend, RATE_LIMIT_SQLITE_PATH=buckets)
+        process = start_server(command, base_url, env)
+        try:
+            for flood in (0, options.flood):
+                reads, statuses, latencies = asyncio.run(drive(base_url, options, username, flood))
+                logins = '  '.join(f"{status}: {count / options.duration:.0f}" for status, count in sorted(statuses.items()))
+                if latencies:
+                    logins += f" ({percentile(latencies, 50):.1f})"
+                print(f"{backend:<8} {flood:>6} {percentile(reads, 50):>9.1f} {percentile(reads, 99):>9.1f}"
+                      f" {len(reads) / options.duration:>8.0f}  {logins or '-'}")
+        finally:
+            process.terminate()
+            process.wait()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(buckets + suffix):
+                    os.remove(buckets + suffix)
+
+
+if __name__ == '__main__':
+    main()
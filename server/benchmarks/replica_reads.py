@@ -0,0 +1,126 @@
+# Read throughput with reads split across SQLite replicas (replicas.py).
+# Seeds a scratch primary, copies it to --replicas files and starts
+# gunicorn for each replica count and REPLICA_SELECTION, with
+# `flask replica-sync` recopying the files every --sync-interval seconds.
+# Readers page /events while writers create events and read each one
+# straight back; "stale" counts those read-backs that 404, which
+# read-your-own-writes should keep at zero.
+#
+#   python -m benchmarks.replica_reads --replicas 0 2 --workers 4 --duration 10
+#
+# SQLite files on one disk only stand in for replicas on their own hosts;
+# this checks routing and its overhead, not how far reads scale. Needs
+# httpx and gunicorn.
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.harness import SERVER_DIR, use_scratch_database, percentile, free_port, start_server
+
+use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['OUTBOX_DELIVERY'] = 'inline'
+
+
+def seed(options):
+    from seed import seed_all, SEED_PASSWORD
+    from config import app, db
+    from models import User
+
+    seed_all(argparse.Namespace(
+        users=100, groups=10, events=options.events, rsvps=0, comments=0, memberships=0, invitations=0,
+        batch_size=5000, seed=0, workers=0, progress=False,
+    ))
+    with app.app_context():
+        usernames = db.session.scalars(db.select(User.username).order_by(User.id).limit(options.writers)).all()
+        db.session.remove()
+        db.engine.dispose()
+    return usernames, SEED_PASSWORD
+
+
+async def drive(base_url, options, usernames, password):
+    reads, stale, writes = [], [0], [0]
+    limits = httpx.Limits(max_connections=options.readers + options.writers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + options.duration
+
+        async def reader():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.get('/events?limit=30')
+                if response.status_code == 200:
+                    reads.append((time.perf_counter() - started) * 1000)
+
+        async def writer(username):
+            # Its own client, so it carries its own cookies
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as session:
+                await session.post('/login', json={'username': username, 'password': password})
+                while time.monotonic() < deadline:
+                    response = await session.post('/events', json={
+                        'name': 'replica check', 'date': '2030-01-01T10:00', 'location': 'here', 'description': 'x',
+                    })
+                    writes[0] += 1
+                    event_id = response.json()['event']['id']
+                    if (await session.get(f"/events/{event_id}")).status_code == 404:
+                        stale[0] += 1
+                    await asyncio.sleep(options.write_pause)
+
+        await asyncio.gather(*(reader() for _ in range(options.readers)), *(writer(name) for name in usernames))
+    return reads, writes[0], stale[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--replicas', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--selections', nargs='+', default=['round_robin', 'least_connections'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=16)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--write-pause', type=float, default=0.2)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--sync-interval', type=float, default=1)
+    parser.add_argument('--events', type=int, default=5000)
+    options = parser.parse_args()
+
+    usernames, password = seed(options)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f"127.0.0.1:{port}",
+               '--workers', str(options.workers), '--threads', str(options.threads), '--log-level', 'warning']
+
+    print(f"{'replicas':>8} {'selection':<18} {'read p50':>9} {'read p99':>9} {'reads/s':>8} {'writes':>7} {'stale':>6}")
+    for replicas in options.replicas:
+        for selection in options.selections if replicas else ['-']:
+            directory = tempfile.mkdtemp(prefix='replicas-')
+            urls = ','.join(f"sqlite:///{directory}/replica{i}.db" for i in range(replicas))
+            env = dict(os.environ, DATABASE_REPLICA_URLS=urls, REPLICA_SELECTION=selection)
+            syncer = None
+            if replicas:
+                subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'replica-sync'],
+                               cwd=SERVER_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                syncer = subprocess.Popen(
+                    [sys.executable, '-m', 'flask', '--app', 'app', 'replica-sync', '--interval', str(options.sync_interval)],
+                    cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+            process = start_server(command, base_url, env)
+            try:
+                reads, writes, stale = asyncio.run(drive(base_url, options, usernames, password))
+            finally:
+                for child in filter(None, (process, syncer)):
+                    child.terminate()
+                    child.wait()
+                shutil.rmtree(directory, ignore_errors=True)
+            print(f"{replicas:>8} {selection:<18} {percentile(reads, 50):>9.1f} {percentile(reads, 99):>9.1f}"
+                  f" {len(reads) / options.duration:>8.0f} {writes:>7} {stale:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Bytes on the wire and encoding CPU per endpoint: the previous pipeline
+# (stdlib json.dumps with default separators, no compression) against
+# responses.py's compact encoder plus gzip and brotli. Payloads come from a
+# seeded scratch database through the test client; CPU is the mean time to
+# encode (and compress) each payload over --repeat runs.
+#
+#   python -m benchmarks.response_size --events 5000 --repeat 50
+import argparse
+import gzip
+import json
+import os
+import time
+
+from benchmarks.harness import use_scratch_database, login
+
+use_scratch_database()
+os.environ['CACHE_BACKEND'] = 'none'
+
+from app import app  # noqa: E402
+from config import db  # noqa: E402
+from models import User, Event, GroupInvitation  # noqa: E402
+from responses import brotli, make_dumps, orjson  # noqa: E402
+from seed import seed_all, SEED_PASSWORD  # noqa: E402
+
+ENDPOINTS = [
+    ('events', '/events?limit=100'),
+    ('users', '/users?limit=100'),
+    ('groups', '/groups?limit=100'),
+    ('invitations', '/invitations'),
+    ('profile', '/profile'),
+    ('event detail', '/events/{event_id}'),
+    ('event rsvps', '/events/{event_id}/rsvps'),
+    ('event comments', '/events/{event_id}/comments'),
+]
+
+
+def timed(func, payload, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(payload)
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    seed_all(argparse.Namespace(
+        users=500, groups=100, events=options.events, rsvps=options.events * 5, comments=options.events * 5,
+        memberships=2000, invitations=5000, batch_size=5000, seed=0, workers=0, progress=False,
+    ))
+    with app.app_context():
+        # The user with the most pending invitations, so /invitations is non-trivial
+        username = db.session.scalar(
+            db.select(User.username).join(GroupInvitation, GroupInvitation.invited_user_id == User.id)
+            .where(GroupInvitation.status == 'pending')
+            .group_by(User.id).order_by(db.func.count().desc())
+        )
+        event_id = db.session.scalar(db.select(Event.id).order_by(Event.comment_count.desc()))
+
+    client = app.test_client()
+    login(client, username, SEED_PASSWORD)
+
+    legacy = lambda obj: json.dumps(obj) + '\n'  # noqa: E731  (Flask-RESTful's default)
+    fast_dumps = make_dumps()
+    compact = lambda obj: fast_dumps(obj) + '\n'  # noqa: E731
+    level = app.config['COMPRESS_GZIP_LEVEL']
+    quality = app.config['COMPRESS_BROTLI_QUALITY']
+
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'}; brotli {'available' if brotli else 'not installed'}")
+    print(f"{'endpoint':<16} {'legacy B':>10} {'compact B':>10} {'gzip B':>9} {'br B':>9}"
+          f" {'legacy ms':>10} {'compact ms':>11} {'+gzip ms':>9} {'+br ms':>8}")
+    for name, path in ENDPOINTS:
+        response = client.get(path.format(event_id=event_id))
+        payload = response.get_json()
+
+        old, old_ms = timed(legacy, payload, options.repeat)
+        new, new_ms = timed(compact, payload, options.repeat)
+        body = new.encode('utf-8')
+        gz, gz_ms = timed(lambda data: gzip.compress(data, compresslevel=level, mtime=0), body, options.repeat)
+        if brotli is not None:
+            br, br_ms = timed(lambda data: brotli.compress(data, quality=quality), body, options.repeat)
+            br_bytes = len(br)
+        else:
+            br_bytes, br_ms = 0, 0.0
+        print(f"{name:<16} {len(old.encode('utf-8')):>10} {len(body):>10} {len(gz):>9} {br_bytes:>9}"
+              f" {old_ms:>10.3f} {new_ms:>11.3f} {gz_ms:>9.3f} {br_ms:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+# Benchmark suite for the API. Seeds a scratch database with seed.py, then
+# drives every resource registered in app.py through the Flask test client
+# and reports throughput, p50/p95/p99 latency, SQL statements per request
+# and peak RSS per endpoint. With --url it instead runs a multi-process
+# HTTP load generator against a running server (e.g. gunicorn) for the
+# read endpoints.
+#
+#   python -m benchmarks.run --events 100000 --requests 200 --json out.json
+#   python -m benchmarks.run --compare baseline.json --json out.json --fail-over 25
+#   python -m benchmarks.run --url http://127.0.0.1:8000 --processes 8 --duration 30
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from multiprocessing import Pool
+
+from benchmarks.harness import use_scratch_database, count_queries, percentile
+
+use_scratch_database()
+
+# seed.py's CLI defaults, scaled up
+DATASET = {
+    'users': 1000, 'groups': 100, 'events': 2000, 'rsvps': 5000,
+    'comments': 5000, 'memberships': 2000, 'invitations': 2000,
+}
+
+# method, path and body are callables taking (ctx, i); setup runs untimed
+# before each request. `slow` marks bcrypt-bound scenarios, which run fewer
+# iterations.
+Scenario = namedtuple('Scenario', 'name method path body setup slow')
+
+# Items per batch-endpoint request
+BATCH = 50
+
+
+def scenario(name, method, path, body=None, setup=None, slow=False):
+    return Scenario(name, method, path, body, setup, slow)
+
+
+def _invite_self(ctx, i):
+    # A new group each time: once accepted, the user is a member and can't
+    # be invited to the same group again
+    response = ctx.client.post('/groups', json={'name': f"invite {i}", 'description': 'Invitation target'})
+    assert response.status_code == 201, response.get_json()
+    group_id = response.get_json()['group']['id']
+    response = ctx.client.post(f"/groups/{group_id}/invite", json={'group_id': group_id, 'invited_user_id': ctx.user_id})
+    assert response.status_code == 201, response.get_json()
+    ctx.invitation_id = response.get_json()['invitation']['id']
+
+
+def _create_event(ctx, i):
+    response = ctx.client.post('/events', json={'name': f"doomed {i}", 'date': '2030-01-01T10:00',
+                                                'location': 'Nowhere', 'description': 'To be deleted'})
+    ctx.doomed_event_id = response.get_json()['event']['id']
+
+
+def _create_group(ctx, i):
+    response = ctx.client.post('/groups', json={'name': f"doomed {i}", 'description': 'To be deleted'})
+    ctx.doomed_group_id = response.get_json()['group']['id']
+
+
+def _fresh_session(ctx, i):
+    from benchmarks.harness import login
+    ctx.logout_client = ctx.app.test_client()
+    login(ctx.logout_client, ctx.username, ctx.password)
+
+
+SCENARIOS = [
+    scenario('register', 'POST', lambda c, i: '/register',
+             lambda c, i: {'username': f"bench{i}", 'email': f"bench{i}@example.com", 'password': 'bench-password'},
+             slow=True),
+    scenario('login', 'POST', lambda c, i: '/login',
+             lambda c, i: {'username': c.username, 'password': c.password}, slow=True),
+    scenario('logout', 'POST', lambda c, i: '/logout', setup=_fresh_session, slow=True),
+    scenario('users', 'GET', lambda c, i: '/users'),
+    scenario('users search', 'GET', lambda c, i: f"/users?q={c.user_term}"),
+    scenario('profile', 'GET', lambda c, i: '/profile'),
+    scenario('profile by id', 'GET', lambda c, i: f"/profile/{c.user_id}"),
+    scenario('events', 'GET', lambda c, i: '/events'),
+    scenario('events stream', 'GET', lambda c, i: '/events?stream=ndjson'),
+    scenario('events search', 'GET', lambda c, i: f"/events?q={c.event_term}"),
+    scenario('event detail', 'GET', lambda c, i: f"/events/{c.event_id}"),
+    scenario('events upcoming', 'GET', lambda c, i: '/events/upcoming'),
+    scenario('upcoming groups', 'GET', lambda c, i: '/events/upcoming?scope=groups'),
+    scenario('feed', 'GET', lambda c, i: '/feed'),
+    scenario('event create', 'POST', lambda c, i: '/events',
+             lambda c, i: {'name': f"bench {i}", 'date': '2030-01-01T10:00', 'location': 'Here', 'description': 'Bench'}),
+    scenario('event update', 'PUT', lambda c, i: f"/events/{c.event_id}", lambda c, i: {'location': f"Room {i}", 'date': '2030-01-02T10:00'}),
+    scenario('event delete', 'DELETE', lambda c, i: f"/events/{c.doomed_event_id}", setup=_create_event),
+    scenario('groups', 'GET', lambda c, i: '/groups'),
+    scenario('groups search', 'GET', lambda c, i: f"/groups?q={c.group_term}"),
+    scenario('group detail', 'GET', lambda c, i: f"/groups/{c.group_id}"),
+    scenario('group members', 'GET', lambda c, i: f"/groups/{c.group_id}/members?user_ids="
+             + ','.join(str(n % c.user_count + 1) for n in range(i, i + BATCH))),
+    scenario('group create', 'POST', lambda c, i: '/groups',
+             lambda c, i: {'name': f"bench {i}", 'description': 'Bench'}),
+    scenario('group delete', 'DELETE', lambda c, i: f"/groups/{c.doomed_group_id}", setup=_create_group),
+    scenario('group invite', 'POST', lambda c, i: f"/groups/{c.group_id}/invite",
+             lambda c, i: {'group_id': c.group_id, 'invited_user_id': c.other_user_id}),
+    scenario('group invite batch', 'POST', lambda c, i: f"/groups/{c.group_id}/invite",
+             lambda c, i: {'invited_user_ids': [(i * BATCH + n) % c.user_count + 1 for n in range(BATCH)]}),
+    scenario('invitations', 'GET', lambda c, i: '/invitations'),
+    scenario('invitation accept', 'PUT', lambda c, i: f"/invitations/{c.invitation_id}/accept", setup=_invite_self),
+    scenario('invitation deny', 'PUT', lambda c, i: f"/invitations/{c.invitation_id}/deny", setup=_invite_self),
+    scenario('rsvp create', 'POST', lambda c, i: '/rsvps',
+             lambda c, i: {'event_id': c.event_id, 'status': ('going', 'maybe', 'not_going')[i % 3]}),
+    scenario('rsvp batch', 'POST', lambda c, i: '/rsvps/batch',
+             lambda c, i: {'rsvps': [{'event_id': event_id, 'status': ('going', 'maybe', 'not_going')[i % 3]}
+                                     for event_id in c.event_ids]}),
+    scenario('event rsvps', 'GET', lambda c, i: f"/events/{c.event_id}/rsvps"),
+    scenario('comment create', 'POST', lambda c, i: f"/events/{c.event_id}/comments", lambda c, i: {'content': f"Bench {i}"}),
+    scenario('comment batch', 'POST', lambda c, i: '/comments/batch',
+             lambda c, i: {'comments': [{'event_id': event_id, 'content': f"Bench {i}"} for event_id in c.event_ids]}),
+    scenario('event comments', 'GET', lambda c, i: f"/events/{c.event_id}/comments"),
+    scenario('comments stream', 'GET', lambda c, i: f"/events/{c.event_id}/comments?stream=json"),
+]
+
+
+class Context:
+    pass
+
+
+def first_token(text):
+    return next((token for token in text.split() if token.isalpha() and len(token) > 2), text[:3])
+
+
+def prepare(app, dataset):
+    from config import db
+    from models import User, Event, Group
+    from seed import SEED_PASSWORD
+    from benchmarks.harness import login
+
+    ctx = Context()
+    ctx.app = app
+    ctx.password = SEED_PASSWORD
+    with app.app_context():
+        user = db.session.get(User, 1)
+        ctx.user_id, ctx.username = user.id, user.username
+        ctx.other_user_id = 2 if dataset['users'] > 1 else 1
+        ctx.user_count = dataset['users']
+        # Work on an event and group the benchmark user owns, so updates,
+        # invites and deletes pass the permission checks
+        event = Event.query.filter_by(user_id=user.id).first() or db.session.get(Event, 1)
+        ctx.event_id = event.id
+        ctx.event_ids = list(db.session.scalars(db.select(Event.id).order_by(Event.id).limit(BATCH)))
+        ctx.event_term = first_token(event.name)
+        ctx.user_term = user.username[:3]
+        ctx.group_term = first_token(db.session.get(Group, 1).description)
+
+    ctx.client = app.test_client()
+    login(ctx.client, ctx.username, ctx.password)
+    response = ctx.client.post('/groups', json={'name': 'bench group', 'description': 'Owned by the benchmark'})
+    ctx.group_id = response.get_json()['group']['id']
+    return ctx
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(samples, statuses, elapsed, statements=None):
+    errors = sum(1 for status in statuses if status >= 400)
+    result = {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    if statements is not None:
+        result['sql_per_request'] = round(sum(statements) / max(len(statements), 1), 2)
+        result['sql_max'] = max(statements, default=0)
+    return result
+
+
+def run_in_process(app, ctx, requests, only):
+    results = {}
+    for item in SCENARIOS:
+        if only and item.name not in only:
+            continue
+        iterations = max(requests // 10, 3) if item.slow else requests
+        client = ctx.client
+        samples, statuses, statements = [], [], []
+        busy = 0.0
+        for i in range(iterations):
+            if item.setup:
+                item.setup(ctx, i)
+            if item.name == 'logout':
+                client = ctx.logout_client
+            body = item.body(ctx, i) if item.body else None
+            path = item.path(ctx, i)
+            with app.app_context():
+                with count_queries() as executed:
+                    started = time.perf_counter()
+                    response = client.open(path, method=item.method, json=body)
+                    # Drain streamed bodies inside the timing window
+                    response.get_data()
+                    response.close()
+                    elapsed = time.perf_counter() - started
+            busy += elapsed
+            samples.append(elapsed * 1000)
+            statuses.append(response.status_code)
+            statements.append(len(executed))
+        results[item.name] = summarize(samples, statuses, busy, statements)
+        print_row(item.name, results[item.name])
+    return results
+
+
+def _http_worker(job):
+    base_url, duration, worker = job
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def call(method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    name = f"loadgen{os.getpid()}x{worker}x{int(time.time())}"
+    call('POST', '/register', {'username': name, 'email': f"{name}@example.com", 'password': 'bench-password'})
+    call('POST', '/login', {'username': name, 'password': 'bench-password'})
+    paths = {
+        'users': '/users', 'profile': '/profile', 'events': '/events', 'event detail': '/events/1',
+        'events upcoming': '/events/upcoming', 'feed': '/feed',
+        'groups': '/groups', 'group detail': '/groups/1', 'invitations': '/invitations',
+        'group members': '/groups/1/members?user_ids=' + ','.join(map(str, range(1, 51))),
+        'event rsvps': '/events/1/rsvps', 'event comments': '/events/1/comments',
+    }
+    samples = {label: [] for label in paths}
+    statuses = {label: [] for label in paths}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for label, path in paths.items():
+            started = time.perf_counter()
+            status, _ = call('GET', path)
+            samples[label].append((time.perf_counter() - started) * 1000)
+            statuses[label].append(status)
+    return samples, statuses
+
+
+def run_http(base_url, processes, duration):
+    with Pool(processes) as pool:
+        outcomes = pool.map(_http_worker, [(base_url.rstrip('/'), duration, n) for n in range(processes)])
+    results = {}
+    for label in outcomes[0][0]:
+        samples = [value for outcome in outcomes for value in outcome[0][label]]
+        statuses = [value for outcome in outcomes for value in outcome[1][label]]
+        results[label] = summarize(samples, statuses, duration)
+        # Server-side numbers aren't visible from here
+        results[label].pop('peak_rss_mb')
+        print_row(label, results[label])
+    return results
+
+
+def print_header():
+    print(f"{'endpoint':<18} {'reqs':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql':>6} {'rss MB':>7}")
+
+
+def print_row(name, row):
+    sql = f"{row['sql_per_request']:.1f}" if 'sql_per_request' in row else '-'
+    rss = f"{row['peak_rss_mb']:.0f}" if 'peak_rss_mb' in row else '-'
+    print(f"{name:<18} {row['requests']:>6} {row['errors']:>4} {row['throughput_rps']:>8.1f} {row['p50_ms']:>8.2f} "
+          f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {sql:>6} {rss:>7}")
+
+
+def compare(baseline, results, fail_over):
+    # Returns the endpoints whose p95 regressed by more than fail_over percent
+    regressions = []
+    print(f"\n{'endpoint':<18} {'base p95':>9} {'p95':>9} {'change':>8} {'base sql':>9} {'sql':>6}")
+    for name, row in results.items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        change = (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        flag = ''
+        if fail_over is not None and change > fail_over:
+            regressions.append(name)
+            flag = '  REGRESSED'
+        print(f"{name:<18} {before['p95_ms']:>9.2f} {row['p95_ms']:>9.2f} {change:>7.0f}% "
+              f"{before.get('sql_per_request', '-'):>9} {row.get('sql_per_request', '-'):>6}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API endpoint')
+    for name, default in DATASET.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint (bcrypt-bound ones run a tenth)')
+    parser.add_argument('--only', nargs='*', help='endpoint names to run')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on (off by default)')
+    parser.add_argument('--url', help='run the HTTP load generator against this server instead')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--fail-over', type=float, help='exit 1 if any p95 regresses by more than this percent')
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ['CACHE_BACKEND'] = 'none'
+
+    if args.url:
+        print_header()
+        results = run_http(args.url, args.processes, args.duration)
+        meta = {'mode': 'http', 'url': args.url, 'processes': args.processes, 'duration': args.duration}
+    else:
+        from app import app
+        from seed import seed_all
+
+        dataset = {name: getattr(args, name) for name in DATASET}
+        seed_all(argparse.Namespace(**dataset, batch_size=5000, seed=args.seed, workers=0, progress=False))
+        print_header()
+        results = run_in_process(app, prepare(app, dataset), args.requests, args.only)
+        meta = {'mode': 'in-process', 'dataset': dataset, 'requests': args.requests, 'cache': args.cache}
+
+    meta.update({'python': platform.python_version(), 'platform': platform.platform(), 'timestamp': time.time()})
+    report = {'meta': meta, 'endpoints': results}
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(json.load(handle), results, args.fail_over)
+        if regressions:
+            print(f"p95 regressed by more than {args.fail_over}% on: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
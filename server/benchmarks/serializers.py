@@ -0,0 +1,59 @@
+# Compares SerializerMixin.to_dict() with the hand-listed serialize() on
+# transient model instances and checks that both produce the same JSON.
+#
+#   python -m benchmarks.serializers --rows 10000
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import use_scratch_database
+
+use_scratch_database()
+
+from app import app  # noqa: E402
+from models import User, Event, Group, RSVP, Comment, GroupInvitation  # noqa: E402
+
+
+def build(rows):
+    users = [User(id=i, username=f"user{i}", email=f"user{i}@example.com", password_hash='x') for i in range(rows)]
+    members = users[:10]
+    return {
+        'User': users,
+        'Event': [
+            Event(id=i, name=f"event {i}", date=datetime(2024, 1, 1) + timedelta(minutes=i),
+                  location='Somewhere', description='Description', user_id=i)
+            for i in range(rows)
+        ],
+        'Group': [Group(id=i, name=f"group {i}", description='Description', user_id=i, members=members) for i in range(rows)],
+        'RSVP': [RSVP(id=i, user_id=i, event_id=i, status='going') for i in range(rows)],
+        'Comment': [Comment(id=i, content='Nice', user_id=i, event_id=i) for i in range(rows)],
+        'GroupInvitation': [
+            GroupInvitation(id=i, group_id=i, user_id=i, invited_user_id=i, status='pending') for i in range(rows)
+        ],
+    }
+
+
+def timed(func, objects):
+    started = time.perf_counter()
+    result = [func(obj) for obj in objects]
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark to_dict() against serialize()')
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f"{'model':<16} {'to_dict ms':>11} {'serialize ms':>13} {'speedup':>8}  json")
+        for name, objects in build(args.rows).items():
+            expected, slow = timed(lambda obj: obj.to_dict(), objects)
+            actual, fast = timed(lambda obj: obj.serialize(), objects)
+            # to_dict() key order varies with hash seeding, so compare canonical JSON
+            same = json.dumps(expected, sort_keys=True) == json.dumps(actual, sort_keys=True)
+            print(f"{name:<16} {slow * 1000:>11.1f} {fast * 1000:>13.1f} {slow / fast:>7.0f}x  {'same' if same else 'DIFFERS'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+import hashlib
+import json
+import threading
+import time
+
+from flask import request, make_response
+
+from config import app
+from replicas import use_primary
+from streaming import stream_format
+
+class LRUCache:
+    # In-process cache: least recently used entries are evicted past
+    # max_entries and every entry expires after ttl seconds. Each gunicorn
+    # worker has its own copy, so invalidation reaches other workers only
+    # through the TTL; use the Redis backend when that matters.
+    def __init__(self, max_entries=2048, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    # Generation counters live outside the LRU so eviction can never reset
+    # one and resurrect entries written under an older generation.
+    def generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def bump(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            self._invalidated[tag] = time.time()
+
+    def invalidated_at(self, tag):
+        return self._invalidated.get(tag, 0)
+
+
+class RedisCache:
+    # Shared cache for multiple workers. `client` is anything exposing
+    # get/set(ex=)/delete/incr, e.g. redis.Redis or a local fake.
+    def __init__(self, client, ttl=30, prefix='cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def generation(self, tag):
+        return int(self.client.get(f"{self.prefix}gen:{tag}") or 0)
+
+    def bump(self, tag):
+        self.client.incr(f"{self.prefix}gen:{tag}")
+        self.client.set(f"{self.prefix}invalidated:{tag}", time.time(), ex=3600)
+
+    def invalidated_at(self, tag):
+        return float(self.client.get(f"{self.prefix}invalidated:{tag}") or 0)
+
+
+def build_backend(config):
+    backend = config['CACHE_BACKEND']
+    if backend == 'none':
+        return None
+    if backend == 'redis':
+        import redis
+        return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), ttl=config['CACHE_TTL'])
+    return LRUCache(max_entries=config['CACHE_MAX_ENTRIES'], ttl=config['CACHE_TTL'])
+
+
+response_cache = build_backend(app.config)
+
+
+def set_backend(backend):
+    global response_cache
+    response_cache = backend
+
+
+def _etag(data):
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag):
+    # Weak comparison: the body is the same JSON whatever its encoding
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def cached(*tags, bucket=None):
+    # Caches a Resource GET by path + query string. Tags may reference view
+    # arguments, e.g. 'event:{event_id}'; invalidate() bumps a tag's
+    # generation, which changes the key of every entry that depends on it.
+    # bucket() adds anything else the response depends on, e.g. the day.
+    def decorator(method):
+        @wraps(method)
+        def wrapper(resource, **kwargs):
+            backend = response_cache
+            # Streamed responses are never cached (see streaming.py)
+            if backend is None or stream_format() is not None:
+                return method(resource, **kwargs)
+
+            tags_now = [tag.format(**kwargs) for tag in tags]
+            generations = ','.join(str(backend.generation(tag)) for tag in tags_now)
+            key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}#{generations}"
+            if bucket is not None:
+                key += f"@{bucket()}"
+            entry = backend.get(key)
+            status = 'HIT'
+            if entry is None:
+                status = 'MISS'
+                # A replica may not have caught up with the write that just
+                # invalidated this entry; refill it from the primary
+                window = app.config['READ_YOUR_WRITES_SECONDS']
+                if app.extensions.get('replicas') and window and any(
+                    backend.invalidated_at(tag) > time.time() - window for tag in tags_now
+                ):
+                    use_primary()
+                result = method(resource, **kwargs)
+                if not isinstance(result, tuple):
+                    result = (result, 200)
+                data, code, headers = (tuple(result) + ({},))[:3]
+                if code != 200:
+                    return result
+                entry = {'data': data, 'headers': dict(headers or {}), 'etag': _etag(data)}
+                backend.set(key, entry)
+
+            not_modified = _not_modified(entry['etag'])
+            if not_modified is not None:
+                return not_modified
+            return entry['data'], 200, {**entry['headers'], 'ETag': f'W/"{entry["etag"]}"', 'X-Cache': status}
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    if response_cache is not None:
+        for tag in tags:
+            response_cache.bump(tag)
@@ -3,13 +3,152 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import Engine, make_url
 import os
+import sqlite3
+
+from replicas import RoutingSession
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+
+
+def database_url():
+    url = os.getenv('DATABASE_URL', 'sqlite:///app.db')
+    # Hosting platforms still hand out the scheme SQLAlchemy 1.4 dropped
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        # busy_timeout is set by the pragma hook below
+        return {}
+
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+    }
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if backend == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.json.compact = False
+
+# Read replicas (see replicas.py): comma-separated URLs, empty for none
+app.config['DATABASE_REPLICA_URLS'] = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['REPLICA_SELECTION'] = os.getenv('REPLICA_SELECTION', 'round_robin')  # round_robin or least_connections
+app.config['READ_YOUR_WRITES_SECONDS'] = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+# Applied to every new SQLite connection so several gunicorn workers can
+# write without "database is locked": WAL lets readers run alongside the
+# single writer and busy_timeout makes writers wait instead of failing.
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # SQLite ignores ON DELETE CASCADE (and every other foreign key) unless
+    # this is on for the connection
+    'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', 'ON'),
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_sqlite_pragmas(dbapi_connection)
+
+
+# Response encoding and compression (see responses.py)
+app.config['JSON_PRETTY'] = os.getenv('JSON_PRETTY', '0') == '1'
+app.config['COMPRESS_RESPONSES'] = os.getenv('COMPRESS_RESPONSES', '1') == '1'
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+# Response cache for public GET endpoints (see cache.py)
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')  # memory, redis or none
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 30))
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Process-wide current-user cache behind @jwt_required() (see identity.py)
+app.config['IDENTITY_CACHE_TTL'] = int(os.getenv('IDENTITY_CACHE_TTL', 60))
+app.config['IDENTITY_CACHE_MAX_ENTRIES'] = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', 10000))
+
+# Home feed (see feed.py). Groups with more members than this get one
+# shared feed row per post, merged in at read time, instead of a row per
+# member; 0 reads every group's activity at request time.
+app.config['FEED_FANOUT_MAX_MEMBERS'] = int(os.getenv('FEED_FANOUT_MAX_MEMBERS', 500))
+app.config['FEED_BACKFILL_ITEMS'] = int(os.getenv('FEED_BACKFILL_ITEMS', 50))
+app.config['FEED_MAX_ITEMS'] = int(os.getenv('FEED_MAX_ITEMS', 1000))
+
+# Deleting events and groups (see purge.py): cascade deletes children in
+# the request; background hides the row at once and purges it in batches.
+app.config['DELETE_MODE'] = os.getenv('DELETE_MODE', 'cascade')
+app.config['PURGE_BATCH_SIZE'] = int(os.getenv('PURGE_BATCH_SIZE', 1000))
+app.config['PURGE_INTERVAL'] = float(os.getenv('PURGE_INTERVAL', 30))
+
+# Post-write side effects (see outbox.py and worker.py). worker leaves them
+# to `python -m server.worker`; inline runs them in the request, for
+# development without a worker.
+app.config['OUTBOX_DELIVERY'] = os.getenv('OUTBOX_DELIVERY', 'worker')
+app.config['OUTBOX_BATCH_SIZE'] = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+app.config['OUTBOX_CONCURRENCY'] = int(os.getenv('OUTBOX_CONCURRENCY', 4))
+app.config['OUTBOX_POLL_INTERVAL'] = float(os.getenv('OUTBOX_POLL_INTERVAL', 1))
+app.config['OUTBOX_LEASE_SECONDS'] = int(os.getenv('OUTBOX_LEASE_SECONDS', 60))
+app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+app.config['OUTBOX_RETRY_BASE_SECONDS'] = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 2))
+
+# Admission control (see ratelimit.py). Limits are "requests/seconds" per
+# client and resource class, empty to disable; concurrency caps are per
+# route and process, 0 for none.
+app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'sqlite')  # sqlite, redis, memory or none
+app.config['RATE_LIMIT_SQLITE_PATH'] = os.getenv('RATE_LIMIT_SQLITE_PATH', '')  # default: instance/ratelimit.db
+app.config['RATE_LIMIT_REDIS_URL'] = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/1')
+app.config['RATE_LIMITS'] = {
+    'auth': os.getenv('RATE_LIMIT_AUTH', '20/60'),
+    'write': os.getenv('RATE_LIMIT_WRITE', '120/60'),
+    'heavy': os.getenv('RATE_LIMIT_HEAVY', '120/60'),
+}
+app.config['CONCURRENCY_LIMITS'] = {
+    'auth': int(os.getenv('CONCURRENCY_LIMIT_AUTH', 4)),
+    'write': int(os.getenv('CONCURRENCY_LIMIT_WRITE', 0)),
+    'heavy': int(os.getenv('CONCURRENCY_LIMIT_HEAVY', 8)),
+}
+app.config['PROXY_FIX_HOPS'] = int(os.getenv('PROXY_FIX_HOPS', 0))
+
+# Password hashing (see passwords.py). Changing BCRYPT_ROUNDS rehashes
+# existing passwords on their next successful login.
+app.config['BCRYPT_ROUNDS'] = int(os.getenv('BCRYPT_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 8))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+# Request metrics, Server-Timing and /metrics (see instrumentation.py).
+# With PROFILE_SLOW_MS set, PROFILE_SAMPLE_RATE of requests run under
+# cProfile and those slower than the threshold are dumped to PROFILE_DIR.
+app.config['INSTRUMENTATION_ENABLED'] = os.getenv('INSTRUMENTATION_ENABLED', '0') == '1'
+app.config['PROFILE_SLOW_MS'] = float(os.getenv('PROFILE_SLOW_MS', 0))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0.01))
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', 'profiles')
 
 app.config['JWT_TOKEN_LOCATION'] = ['cookies']
 app.config['JWT_COOKIE_SECURE'] = False  # Set to True in production when using HTTPS
@@ -20,13 +159,27 @@ app.config['JWT_REFRESH_COOKIE_PATH'] = '/token/refresh'
 app.config['JWT_COOKIE_CSRF_PROTECT'] = False
 app.config['JWT_CSRF_CHECK_FORM'] = True
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your_secure_secret_key')  # Updated to a more secure key
+# Let flask_jwt_extended's error handlers answer auth failures (401/422)
+# instead of Flask-RESTful turning them into 500s
+app.config['PROPAGATE_EXCEPTIONS'] = True
 
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
-db = SQLAlchemy(metadata=metadata)
-migrate = Migrate(app, db)
+db = SQLAlchemy(metadata=metadata, session_options={'class_': RoutingSession})
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Full-text search tables and indexes are raw DDL owned by search.py
+    if reflected and compare_to is None and ('_fts' in name or name.endswith('_search')):
+        return False
+    return True
+
+migrate = Migrate(app, db, include_object=include_object)
 db.init_app(app)
 
 api = Api(app)
-CORS(app, supports_credentials=True, origins=["http://localhost:3000"])  # Make sure the CORS origins match your frontend URL
+app.config['CORS_ORIGINS'] = ["http://localhost:3000"]  # Make sure the CORS origins match your frontend URL
+app.config['CORS_SUPPORTS_CREDENTIALS'] = True
+app.config['CORS_EXPOSE_HEADERS'] = ["X-Next-Cursor", "Link"]
+CORS(app)
@@ -0,0 +1,127 @@
+# Denormalized counters on Event and Group. Writers call the bump helpers
+# inside their own transaction, before commit; ORM deletes of comments and
+# RSVPs (including cascades from a deleted user) decrement through mapper
+# events. reconcile_counters() rebuilds everything from the source tables.
+import click
+from sqlalchemy import bindparam, case, event, func, select, update
+
+from config import app, db
+from models import Event, Group, RSVP, Comment, RSVP_STATUSES, group_member
+
+RSVP_COUNT_COLUMNS = {
+    'going': 'rsvp_going_count',
+    'maybe': 'rsvp_maybe_count',
+    'not_going': 'rsvp_not_going_count',
+}
+
+
+def _bump(connection, model, row_id, **deltas):
+    # UPDATE ... SET counter = counter + delta, so concurrent writers can't
+    # lose each other's increments
+    table = model.__table__
+    values = {name: table.c[name] + delta for name, delta in deltas.items() if delta}
+    if values:
+        connection.execute(update(table).where(table.c.id == row_id).values(**values))
+
+
+def _bump_many(model, deltas_by_id):
+    # Same as _bump for many rows: one executemany UPDATE. deltas_by_id maps
+    # row id -> {column: delta}.
+    if not deltas_by_id:
+        return
+    table = model.__table__
+    columns = sorted({name for deltas in deltas_by_id.values() for name in deltas})
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        **{name: table.c[name] + bindparam(f"delta_{name}") for name in columns}
+    )
+    db.session.execute(statement, [
+        {'row_id': row_id, **{f"delta_{name}": deltas.get(name, 0) for name in columns}}
+        for row_id, deltas in deltas_by_id.items()
+    ])
+
+
+def lock_events(event_ids):
+    # SELECT ... FOR UPDATE on the events, in id order so writers can't
+    # deadlock. A recount runs on its statement's snapshot, so without the
+    # lock two concurrent RSVPs to one event under READ COMMITTED each miss
+    # the other's insert and one count is lost. SQLite serializes writers
+    # and has no row locks, so it skips the round trip.
+    if not event_ids or db.session.get_bind().dialect.name == 'sqlite':
+        return
+    events = Event.__table__
+    db.session.execute(
+        select(events.c.id).where(events.c.id.in_(event_ids)).order_by(events.c.id).with_for_update()
+    )
+
+
+def refresh_rsvp_counts(event_ids):
+    # Recount RSVPs for a few events from the rsvps table. Upserts don't report
+    # the status they replaced, so they recount instead of applying deltas;
+    # callers hold lock_events() on the same events first.
+    if not event_ids:
+        return
+    events = Event.__table__
+    db.session.execute(update(events).where(events.c.id.in_(list(event_ids))).values(**{
+        column: select(func.count()).where(RSVP.event_id == events.c.id, RSVP.status == status).scalar_subquery()
+        for status, column in RSVP_COUNT_COLUMNS.items()
+    }))
+
+
+def comments_added(event_id, count=1):
+    _bump(db.session, Event, event_id, comment_count=count)
+
+
+def comments_added_many(counts_by_event):
+    _bump_many(Event, {event_id: {'comment_count': count} for event_id, count in counts_by_event.items()})
+
+
+def members_added(group_id, count=1):
+    _bump(db.session, Group, group_id, member_count=count)
+
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    _bump(connection, Event, target.event_id, comment_count=-1)
+
+
+@event.listens_for(RSVP, 'after_delete')
+def _rsvp_deleted(mapper, connection, target):
+    if target.status in RSVP_COUNT_COLUMNS:
+        _bump(connection, Event, target.event_id, **{RSVP_COUNT_COLUMNS[target.status]: -1})
+
+
+def reconcile_counters():
+    # One GROUP BY per source table, applied with UPDATE ... FROM. Rows with
+    # no children don't appear in the aggregates, so zero everything first.
+    events = Event.__table__
+    groups = Group.__table__
+    db.session.execute(update(events).values(
+        rsvp_going_count=0, rsvp_maybe_count=0, rsvp_not_going_count=0, comment_count=0,
+    ))
+    db.session.execute(update(groups).values(member_count=0))
+
+    rsvp_totals = select(
+        RSVP.event_id,
+        *(func.sum(case((RSVP.status == status, 1), else_=0)).label(status) for status in RSVP_STATUSES),
+    ).group_by(RSVP.event_id).subquery()
+    db.session.execute(update(events).where(events.c.id == rsvp_totals.c.event_id).values(
+        **{column: rsvp_totals.c[status] for status, column in RSVP_COUNT_COLUMNS.items()}
+    ))
+
+    comment_totals = select(Comment.event_id, func.count().label('total')).group_by(Comment.event_id).subquery()
+    db.session.execute(update(events).where(events.c.id == comment_totals.c.event_id).values(
+        comment_count=comment_totals.c.total
+    ))
+
+    member_totals = select(group_member.c.group_id, func.count().label('total')).group_by(group_member.c.group_id).subquery()
+    db.session.execute(update(groups).where(groups.c.id == member_totals.c.group_id).values(
+        member_count=member_totals.c.total
+    ))
+    db.session.commit()
+
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Recompute RSVP, comment and member counters from the source tables."""
+    reconcile_counters()
+    click.echo('Counters reconciled.')
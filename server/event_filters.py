@@ -0,0 +1,85 @@
+# Calendar queries over events.date, shared by EventList (app.py and
+# asgi.py) and UpcomingEvents:
+#   ?from=  inclusive lower bound, YYYY-MM-DD or YYYY-MM-DDTHH:MM
+#   ?to=    exclusive upper bound, same formats
+#   ?sort=  id (default) or date; date pages by (date, id) on ix_events_date
+from datetime import date, datetime, time
+
+from flask_restful import abort
+from sqlalchemy import or_, select
+
+from models import Event, group_member
+from pagination import paginate
+from search import search
+
+DATE_FORMATS = ('%Y-%m-%dT%H:%M', '%Y-%m-%d')
+DATE_KEYS = [Event.date, Event.id]
+
+
+def parse_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    abort(400, message=f"{name} must be YYYY-MM-DD or YYYY-MM-DDTHH:MM")
+
+
+def date_range(query, args):
+    start, end = parse_date(args, 'from'), parse_date(args, 'to')
+    if start is not None:
+        query = query.filter(Event.date >= start)
+    if end is not None:
+        query = query.filter(Event.date < end)
+    return query
+
+
+def date_key(event):
+    return (event.date.isoformat(), event.id)
+
+
+def date_cursor(after):
+    # Date-sorted cursors carry the date as ISO text; compare on datetimes
+    if after is None:
+        return None
+    try:
+        return [datetime.fromisoformat(after[0]), after[1]]
+    except (TypeError, ValueError, IndexError):
+        abort(400, message="Invalid cursor")
+
+
+def sorted_by_date(args):
+    sort = args.get('sort', 'id')
+    if sort not in ('id', 'date'):
+        abort(400, message="sort must be id or date")
+    return sort == 'date'
+
+
+def list_events(query, args, limit, after):
+    # Returns (events, next_cursor) for ?q=, ?from=/?to= and ?sort=
+    by_date = sorted_by_date(args)
+    query = date_range(query, args)
+    text = args.get('q', '')
+    if text:
+        if by_date:
+            abort(400, message="Search results are ranked; sort=date cannot be combined with q")
+        return search(query, Event, text, limit, after)
+    if by_date:
+        return paginate(query, DATE_KEYS, limit, date_cursor(after), key_of=date_key)
+    return paginate(query, [Event.id], limit, after)
+
+
+def today():
+    # Start of the current day; event dates are stored as naive local times
+    return datetime.combine(date.today(), time.min)
+
+
+def hosted_by_group_mates(user_id):
+    # Events hosted by the user or anyone sharing a group with them; each
+    # host id is a range scan on ix_events_user_id_date
+    my_groups = select(group_member.c.group_id).where(group_member.c.user_id == user_id)
+    mates = select(group_member.c.user_id).where(group_member.c.group_id.in_(my_groups))
+    return or_(Event.user_id == user_id, Event.user_id.in_(mates))
@@ -0,0 +1,268 @@
+# Home feed: new events and comments from everyone who shares a group with
+# the reader, newest first, materialized in feed_items on write.
+#
+# Writers queue posts with queue_publish() and joins with queue_backfill(),
+# and the outbox worker (outbox.py) runs publish() and backfill() off the
+# request path. For each of the author's groups with at most
+# FEED_FANOUT_MAX_MEMBERS members, publish() adds one row per member
+# (fan-out on write; a reader's page is one range scan on
+# ix_feed_items_user_id_id). Larger groups get a single row for the group
+# instead, and read_feed() merges those groups' rows with the reader's own
+# (fan-out on read), so a post to a 100k-member group is one insert.
+#
+# Members of the author's large groups are left out of the per-member rows,
+# so a reader only sees the same post twice when they share several large
+# groups with the author; those copies come from one statement, have
+# adjacent ids, and are dropped while merging. A group whose size crosses
+# the threshold keeps its existing rows where they are: rows for a group
+# that has since shrunk are no longer read.
+import heapq
+
+import click
+from sqlalchemy import Integer, String, bindparam, delete, select
+
+from config import app, db
+from models import Event, Comment, Group, User, FeedItem, format_datetime, group_member
+from outbox import enqueue, handler
+
+feed_items = FeedItem.__table__
+groups = Group.__table__
+member = group_member.alias('member')
+COLUMNS = ['actor_id', 'kind', 'event_id', 'comment_id']
+
+
+def _actor_groups(large):
+    # The author's groups on one side of the fan-out threshold
+    max_members = bindparam('max_members', type_=Integer)
+    size = groups.c.member_count > max_members if large else groups.c.member_count <= max_members
+    return (
+        select(group_member.c.group_id)
+        .join(groups, groups.c.id == group_member.c.group_id)
+        .where(group_member.c.user_id == bindparam('actor_id', type_=Integer), size)
+    )
+
+
+def _activity_columns():
+    return [
+        bindparam('actor_id', type_=Integer), bindparam('kind', type_=String),
+        bindparam('event_id', type_=Integer), bindparam('comment_id', type_=Integer),
+    ]
+
+
+def _fan_out_statements():
+    large = _actor_groups(large=True)
+    in_large_group = select(group_member.c.user_id).where(
+        group_member.c.user_id == member.c.user_id,
+        group_member.c.group_id.in_(large),
+    ).exists()
+    to_members = feed_items.insert().from_select(['user_id', *COLUMNS], (
+        select(member.c.user_id, *_activity_columns()).distinct()
+        .where(member.c.group_id.in_(_actor_groups(large=False)), ~in_large_group)
+    ))
+    to_groups = feed_items.insert().from_select(['group_id', *COLUMNS], (
+        select(large.subquery().c.group_id, *_activity_columns())
+    ))
+    return to_members, to_groups
+
+
+TO_MEMBERS, TO_GROUPS = _fan_out_statements()
+
+
+def activity(actor_id, kind, event_id, comment_id=None):
+    return {'actor_id': actor_id, 'kind': kind, 'event_id': event_id, 'comment_id': comment_id}
+
+
+def publish(session, activities):
+    # One executemany per statement, so a batch of comments costs the same
+    # two round trips as a single one
+    if not activities:
+        return
+    params = [dict(item, max_members=app.config['FEED_FANOUT_MAX_MEMBERS']) for item in activities]
+    session.execute(TO_MEMBERS, params)
+    session.execute(TO_GROUPS, params)
+
+
+def queue_publish(session, activities):
+    enqueue(session, 'feed.publish', {'activities': activities})
+
+
+def queue_backfill(session, user_id, group_id):
+    enqueue(session, 'feed.backfill', {'user_id': user_id, 'group_id': group_id})
+
+
+# Serial, so feed rows get ids in the order the posts were made; the feed
+# is read in id order
+@handler('feed.publish', max_concurrency=1)
+def _publish_handler(session, payload):
+    # The event or comment may have been deleted since the post was queued
+    activities = payload['activities']
+    events = set(session.scalars(select(Event.id).where(Event.id.in_({item['event_id'] for item in activities}))))
+    comments = set(session.scalars(select(Comment.id).where(Comment.id.in_(
+        {item['comment_id'] for item in activities if item['comment_id'] is not None}
+    ))))
+    publish(session, [
+        item for item in activities
+        if item['event_id'] in events and (item['comment_id'] is None or item['comment_id'] in comments)
+    ])
+
+
+@handler('feed.backfill')
+def _backfill_handler(session, payload):
+    backfill(session, payload['user_id'], payload['group_id'])
+
+
+def backfill(session, user_id, group_id):
+    # A new member's feed starts with the group's recent events and
+    # comments, each oldest first. Large groups are read live instead.
+    group = session.get(Group, group_id)
+    if group is None or group.member_count > app.config['FEED_FANOUT_MAX_MEMBERS']:
+        return
+    count = app.config['FEED_BACKFILL_ITEMS']
+    members = select(group_member.c.user_id).where(
+        group_member.c.group_id == group_id, group_member.c.user_id != user_id,
+    )
+    events = session.execute(
+        select(Event.id, Event.user_id).where(Event.user_id.in_(members)).order_by(Event.id.desc()).limit(count)
+    ).all()
+    comments = session.execute(
+        select(Comment.id, Comment.event_id, Comment.user_id)
+        .where(Comment.user_id.in_(members)).order_by(Comment.id.desc()).limit(count)
+    ).all()
+    recent = [activity(row.user_id, 'event', row.id) for row in events]
+    recent += [activity(row.user_id, 'comment', row.event_id, row.id) for row in comments]
+    if not recent:
+        return
+
+    # Skip anything already delivered through another shared group
+    delivered = set(session.execute(
+        select(FeedItem.kind, FeedItem.event_id, FeedItem.comment_id).where(
+            FeedItem.user_id == user_id,
+            FeedItem.event_id.in_({item['event_id'] for item in recent}),
+        )
+    ).all())
+    rows = [
+        dict(item, user_id=user_id) for item in reversed(recent)
+        if (item['kind'], item['event_id'], item['comment_id']) not in delivered
+    ]
+    if rows:
+        session.execute(feed_items.insert(), rows)
+
+
+def _page(session, sources, limit, after):
+    # Newest rows from each source, merged. Sources are truncated at
+    # `window` rows; below the highest id a truncated source stopped at,
+    # that source may still have rows, so the page has to end there.
+    window = limit * 2 + 1
+    streams = []
+    for source in sources:
+        query = select(feed_items.c.id, feed_items.c.kind, feed_items.c.event_id, feed_items.c.comment_id).where(source)
+        if after is not None:
+            query = query.where(feed_items.c.id < after)
+        streams.append(session.execute(query.order_by(feed_items.c.id.desc()).limit(window)).all())
+    floor = max((rows[-1].id for rows in streams if len(rows) == window), default=None)
+
+    picked, seen, cursor = [], set(), None
+    for row in heapq.merge(*streams, key=lambda row: -row.id):
+        key = (row.kind, row.event_id, row.comment_id)
+        if key in seen:
+            cursor = row.id
+            continue
+        if len(picked) == limit or (floor is not None and row.id < floor):
+            break
+        seen.add(key)
+        picked.append(row.id)
+        cursor = row.id
+    else:
+        if floor is None:
+            cursor = None
+    return picked, cursor
+
+
+def read_feed(session, user_id, limit, after=None):
+    # Returns (items, next_cursor) where next_cursor is the last feed row id
+    # consumed, or None on the last page
+    large_groups = session.scalars(
+        select(group_member.c.group_id)
+        .join(groups, groups.c.id == group_member.c.group_id)
+        .where(group_member.c.user_id == user_id, groups.c.member_count > app.config['FEED_FANOUT_MAX_MEMBERS'])
+    ).all()
+    sources = [feed_items.c.user_id == user_id] + [feed_items.c.group_id == group_id for group_id in large_groups]
+    ids, next_cursor = _page(session, sources, limit, after)
+    if not ids:
+        return [], next_cursor
+
+    rows = session.execute(
+        select(
+            FeedItem.id, FeedItem.kind, FeedItem.created_at,
+            User.id.label('actor_id'), User.username,
+            Event.id.label('event_id'), Event.name, Event.date, Event.location,
+            Comment.id.label('comment_id'), Comment.content,
+        )
+        .join(User, User.id == FeedItem.actor_id)
+        .join(Event, Event.id == FeedItem.event_id)
+        .outerjoin(Comment, Comment.id == FeedItem.comment_id)
+        .where(FeedItem.id.in_(ids))
+    ).all()
+    by_id = {row.id: row for row in rows}
+
+    items = []
+    for feed_id in ids:
+        row = by_id.get(feed_id)
+        # Rows outlive their event, comment or author until purged
+        if row is None or (row.kind == 'comment' and row.comment_id is None):
+            continue
+        items.append({
+            'id': row.id,
+            'kind': row.kind,
+            'created_at': format_datetime(row.created_at),
+            'actor': {'id': row.actor_id, 'username': row.username},
+            'event': {'id': row.event_id, 'name': row.name, 'date': format_datetime(row.date), 'location': row.location},
+            'comment': {'id': row.comment_id, 'content': row.content} if row.kind == 'comment' else None,
+        })
+    return items, next_cursor
+
+
+def trim_feed(keep):
+    # Keeps the newest `keep` rows per reader and per large group
+    for column in (feed_items.c.user_id, feed_items.c.group_id):
+        newest = feed_items.alias('newest')
+        cutoff = (
+            select(newest.c.id)
+            .where(newest.c[column.name] == column)
+            .order_by(newest.c.id.desc())
+            .offset(keep - 1).limit(1)
+            .scalar_subquery()
+        )
+        db.session.execute(delete(feed_items).where(column.is_not(None), feed_items.c.id < cutoff))
+    db.session.commit()
+
+
+def rebuild_feed(recent):
+    # Re-publishes the newest `recent` events and comments in id order, with
+    # the current group sizes and threshold
+    db.session.execute(delete(feed_items))
+    events = db.session.execute(select(Event.id, Event.user_id).order_by(Event.id.desc()).limit(recent)).all()
+    comments = db.session.execute(
+        select(Comment.id, Comment.event_id, Comment.user_id).order_by(Comment.id.desc()).limit(recent)
+    ).all()
+    # Events first, then comments: the two tables share no clock
+    activities = [activity(row.user_id, 'event', row.id) for row in reversed(events)]
+    activities += [activity(row.user_id, 'comment', row.event_id, row.id) for row in reversed(comments)]
+    publish(db.session, activities)
+    db.session.commit()
+    return len(activities)
+
+
+@app.cli.command('trim-feed')
+@click.option('--keep', type=int, default=None, help='rows to keep per reader (default FEED_MAX_ITEMS)')
+def trim_feed_command(keep):
+    """Drop feed rows beyond the newest FEED_MAX_ITEMS per reader and group."""
+    trim_feed(keep or app.config['FEED_MAX_ITEMS'])
+    click.echo('Feed trimmed.')
+
+
+@app.cli.command('rebuild-feed')
+@click.option('--recent', type=int, default=10000, help='newest events and comments to publish')
+def rebuild_feed_command(recent):
+    """Rebuild feed_items from the newest events and comments."""
+    click.echo(f"Published {rebuild_feed(recent)} activities.")
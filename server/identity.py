@@ -0,0 +1,87 @@
+# Current-user lookup for @jwt_required() resources. flask_jwt_extended
+# already calls the user_lookup_loader at most once per request (the result
+# is kept on flask.g); behind it, a short-TTL process-wide LRU keyed on the
+# token's sub holds the user's column values, so most requests build
+# current_user without a SELECT. Entries are dropped on logout and whenever
+# the user row is updated or deleted, and otherwise expire after
+# IDENTITY_CACHE_TTL. Like the memory backend in cache.py the LRU is per
+# process, so other workers only see a change once their entry expires.
+import threading
+
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from cache import LRUCache
+from config import app, db
+from instrumentation import metric_sources
+from models import User
+
+IDENTITY_COLUMNS = ('id', 'username', 'email', 'password_hash')
+
+identity_cache = LRUCache(
+    max_entries=app.config['IDENTITY_CACHE_MAX_ENTRIES'],
+    ttl=app.config['IDENTITY_CACHE_TTL'],
+)
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def jwt_user_id():
+    # The token's sub as an int, for ownership checks against foreign keys
+    return int(get_jwt_identity())
+
+
+def forget_user(user_id):
+    identity_cache.delete(str(user_id))
+
+
+def load_user(jwt_header, jwt_data):
+    user_id = jwt_data[app.config['JWT_IDENTITY_CLAIM']]
+    values = identity_cache.get(str(user_id))
+    if values is None:
+        _count('misses')
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            return None
+        identity_cache.set(str(user_id), {name: getattr(user, name) for name in IDENTITY_COLUMNS})
+        return user
+
+    _count('hits')
+    # Rebuild a detached instance and merge it without a SELECT, so
+    # relationships still lazy-load and writes go through this session
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def init_identity(jwt):
+    jwt.user_lookup_loader(load_user)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    forget_user(target.id)
+
+
+def _metrics():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    return [
+        '# HELP identity_cache_requests_total Current-user lookups by outcome',
+        '# TYPE identity_cache_requests_total counter',
+        f'identity_cache_requests_total{{outcome="hit"}} {hits}',
+        f'identity_cache_requests_total{{outcome="miss"}} {misses}',
+        '# HELP identity_cache_hit_ratio Share of current-user lookups served from the cache',
+        '# TYPE identity_cache_hit_ratio gauge',
+        f'identity_cache_hit_ratio {hits / (hits + misses) if hits + misses else 0:.4f}',
+    ]
+
+
+metric_sources.append(_metrics)
@@ -0,0 +1,166 @@
+# Opt-in per-request metrics (INSTRUMENTATION_ENABLED=1): wall time, SQL
+# statement count and time, JSON encoding time and response size. They are
+# reported in a Server-Timing header on every response and aggregated into
+# per-route Prometheus histograms at /metrics. Each gunicorn worker keeps
+# its own counters, so scrape every worker or run a single one.
+from bisect import bisect_left
+import cProfile
+import os
+import random
+import threading
+import time
+
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+                lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS)
+SQL_STATEMENTS = Histogram('http_request_sql_statements', 'SQL statements executed per request.', COUNT_BUCKETS)
+SQL_DURATION = Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+SERIALIZATION_DURATION = Histogram('http_request_serialization_seconds', 'Time spent encoding JSON per request.', DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+HISTOGRAMS = [REQUEST_DURATION, SQL_STATEMENTS, SQL_DURATION, SERIALIZATION_DURATION, RESPONSE_SIZE]
+
+# Extra text blocks for /metrics, e.g. counters owned by other modules
+metric_sources = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _finish_query(conn):
+    started = conn.info['query_started'].pop()
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics['sql_count'] += 1
+        g.request_metrics['sql_time'] += time.perf_counter() - started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _finish_query(conn)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; without this its
+    # start time would stay on the pooled connection and skew the next one
+    conn = exception_context.connection
+    if exception_context.statement is not None and conn is not None and conn.info.get('query_started'):
+        _finish_query(conn)
+
+
+def _timed_representation(represent):
+    def wrapper(data, code, headers=None):
+        started = time.perf_counter()
+        response = represent(data, code, headers)
+        if 'request_metrics' in g:
+            g.request_metrics['serialize_time'] += time.perf_counter() - started
+        return response
+    return wrapper
+
+
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    return (('method', request.method), ('route', rule))
+
+
+def init_instrumentation(app, api, db):
+    slow_ms = app.config['PROFILE_SLOW_MS']
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    profile_dir = app.config['PROFILE_DIR']
+
+    with app.app_context():
+        replicas = app.extensions.get('replicas')
+        for engine in [db.engine, *(replicas.engines if replicas else [])]:
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+
+    for mediatype, represent in list(api.representations.items()):
+        api.representations[mediatype] = _timed_representation(represent)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = {'started': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0, 'serialize_time': 0.0}
+        # Profile a sample of requests; only the slow ones are written out
+        if slow_ms and random.random() < sample_rate:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - metrics['started']
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= slow_ms:
+                os.makedirs(profile_dir, exist_ok=True)
+                route = (request.url_rule.rule if request.url_rule else 'unmatched').strip('/').replace('/', '_') or 'root'
+                route = route.replace('<', '').replace('>', '').replace(':', '-')
+                filename = f"{int(time.time() * 1000)}-{request.method}-{route}-{elapsed * 1000:.0f}ms.prof"
+                profiler.dump_stats(os.path.join(profile_dir, filename))
+
+        labels = _route_labels()
+        size = response.calculate_content_length() or 0
+        REQUEST_DURATION.observe(labels, elapsed)
+        SQL_STATEMENTS.observe(labels, metrics['sql_count'])
+        SQL_DURATION.observe(labels, metrics['sql_time'])
+        SERIALIZATION_DURATION.observe(labels, metrics['serialize_time'])
+        RESPONSE_SIZE.observe(labels, size)
+
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={metrics["sql_time"] * 1000:.2f};desc="{metrics["sql_count"]} statements"',
+            f'ser;dur={metrics["serialize_time"] * 1000:.2f}',
+            f'app;dur={elapsed * 1000:.2f}',
+        ]))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        lines = []
+        for histogram in HISTOGRAMS:
+            lines.extend(histogram.render())
+        for source in metric_sources:
+            lines.extend(source())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
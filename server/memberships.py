@@ -0,0 +1,52 @@
+# Group membership as set operations on group_member, answered from its
+# (user_id, group_id) primary key and ix_group_member_group_id_user_id
+# without loading anyone's Group.members or User.groups. Writers call these
+# inside their own transaction and commit themselves.
+from sqlalchemy import exists, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import db
+from counters import members_added
+from models import group_member
+
+INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def is_member(group_id, user_id):
+    return db.session.scalar(select(exists().where(
+        group_member.c.group_id == group_id, group_member.c.user_id == user_id,
+    )))
+
+
+def members_among(group_id, user_ids):
+    # Which of user_ids belong to the group, in one indexed query
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    return set(db.session.scalars(select(group_member.c.user_id).where(
+        group_member.c.group_id == group_id, group_member.c.user_id.in_(user_ids),
+    )))
+
+
+def add_members(group_id, user_ids):
+    # Adds the users who aren't members yet and bumps member_count by that
+    # many. Returns their ids; concurrent adds of the same user can't both
+    # count, because only one INSERT gets the row.
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    rows = [{'group_id': group_id, 'user_id': user_id} for user_id in user_ids]
+    insert = INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        # Dialects without ON CONFLICT: skip the existing rows first
+        existing = members_among(group_id, user_ids)
+        rows = [row for row in rows if row['user_id'] not in existing]
+        if rows:
+            db.session.execute(group_member.insert(), rows)
+        added = {row['user_id'] for row in rows}
+    else:
+        statement = insert(group_member).values(rows).on_conflict_do_nothing().returning(group_member.c.user_id)
+        added = set(db.session.scalars(statement))
+    if added:
+        members_added(group_id, len(added))
+    return added
@@ -0,0 +1,54 @@
+"""add lookup indexes
+
+Revision ID: 5b7e2c91d4a3
+Revises: 2d958629509d
+Create Date: 2026-10-18 09:12:41.530217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c91d4a3'
+down_revision = '2d958629509d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_events_date'), ['date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_events_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_groups_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_comments_event_id'), ['event_id'], unique=False)
+
+    with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+        batch_op.create_index('ix_group_invitations_invited_user_id_status', ['invited_user_id', 'status'], unique=False)
+
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rsvps_event_id'), ['event_id'], unique=False)
+        batch_op.create_index('ix_rsvps_user_id_event_id', ['user_id', 'event_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.drop_index('ix_rsvps_user_id_event_id')
+        batch_op.drop_index(batch_op.f('ix_rsvps_event_id'))
+
+    with op.batch_alter_table('group_invitations', schema=None) as batch_op:
+        batch_op.drop_index('ix_group_invitations_invited_user_id_status')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comments_event_id'))
+
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_groups_user_id'))
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_events_user_id'))
+        batch_op.drop_index(batch_op.f('ix_events_date'))
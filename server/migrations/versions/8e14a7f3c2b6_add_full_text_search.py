@@ -0,0 +1,69 @@
+"""add full text search
+
+Revision ID: 8e14a7f3c2b6
+Revises: 5b7e2c91d4a3
+Create Date: 2026-10-18 11:03:27.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e14a7f3c2b6'
+down_revision = '5b7e2c91d4a3'
+branch_labels = None
+depends_on = None
+
+# Mirrors search.SEARCH_COLUMNS at the time of this revision
+SEARCH_COLUMNS = {
+    'users': ('username',),
+    'events': ('name', 'location', 'description'),
+    'groups': ('name', 'description'),
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for tablename, columns in SEARCH_COLUMNS.items():
+        if dialect == 'sqlite':
+            fts = f"{tablename}_fts"
+            cols = ', '.join(columns)
+            new = ', '.join(f"new.{c}" for c in columns)
+            old = ', '.join(f"old.{c}" for c in columns)
+            op.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{tablename}', "
+                f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tablename} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tablename} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {tablename} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+            )
+            # Index the rows that already exist
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif dialect == 'postgresql':
+            document = " || ' ' || ".join(f"coalesce({c}, '')" for c in columns)
+            op.execute(
+                f"CREATE INDEX ix_{tablename}_search ON {tablename} "
+                f"USING gin (to_tsvector('simple'::regconfig, {document}))"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for tablename in SEARCH_COLUMNS:
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {tablename}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {tablename}_fts")
+        elif dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{tablename}_search")
@@ -0,0 +1,28 @@
+"""add events (user_id, date) index
+
+Revision ID: a7c5e3f1d9b4
+Revises: f2a4d8b6c1e9
+Create Date: 2026-10-18 17:26:51.402318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c5e3f1d9b4'
+down_revision = 'f2a4d8b6c1e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain index DDL rather than batch mode, so SQLite keeps the FTS triggers
+    # on events; the composite index also covers user_id-only lookups
+    op.create_index('ix_events_user_id_date', 'events', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_events_user_id', table_name='events')
+
+
+def downgrade():
+    op.create_index('ix_events_user_id', 'events', ['user_id'], unique=False)
+    op.drop_index('ix_events_user_id_date', table_name='events')
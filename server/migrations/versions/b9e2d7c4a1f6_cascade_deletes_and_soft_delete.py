@@ -0,0 +1,58 @@
+"""on delete cascade for event and group children, soft delete columns
+
+Revision ID: b9e2d7c4a1f6
+Revises: d4b8f1a6e3c7
+Create Date: 2026-10-18 21:05:37.640912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e2d7c4a1f6'
+down_revision = 'd4b8f1a6e3c7'
+branch_labels = None
+depends_on = None
+
+# (table, foreign key column, parent table)
+CASCADES = [
+    ('comments', 'event_id', 'events'),
+    ('rsvps', 'event_id', 'events'),
+    ('group_invitations', 'group_id', 'groups'),
+    ('group_member', 'group_id', 'groups'),
+]
+
+
+def replace_foreign_key(table, column, parent, ondelete):
+    name = f"fk_{table}_{column}_{parent}"
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(name, parent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    # events and groups carry the full-text search triggers, so they only
+    # get plain ADD COLUMN / CREATE INDEX, never a batch rebuild
+    for table in ('events', 'groups'):
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index(f"ix_{table}_deleted_at", table, ['deleted_at'], unique=False)
+
+    for table, column, parent in CASCADES:
+        replace_foreign_key(table, column, parent, 'CASCADE')
+    op.create_index('ix_group_invitations_group_id', 'group_invitations', ['group_id'], unique=False)
+    # Cascades from events and comments look feed rows up by these
+    op.create_index('ix_feed_items_event_id', 'feed_items', ['event_id'], unique=False)
+    op.create_index('ix_feed_items_comment_id', 'feed_items', ['comment_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_feed_items_comment_id', table_name='feed_items')
+    op.drop_index('ix_feed_items_event_id', table_name='feed_items')
+    op.drop_index('ix_group_invitations_group_id', table_name='group_invitations')
+    for table, column, parent in reversed(CASCADES):
+        replace_foreign_key(table, column, parent, None)
+
+    for table in ('groups', 'events'):
+        op.drop_index(f"ix_{table}_deleted_at", table_name=table)
+        op.drop_column(table, 'deleted_at')
@@ -0,0 +1,102 @@
+"""add denormalized counters
+
+Revision ID: c3f9e6a1b8d2
+Revises: 8e14a7f3c2b6
+Create Date: 2026-10-18 13:41:09.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f9e6a1b8d2'
+down_revision = '8e14a7f3c2b6'
+branch_labels = None
+depends_on = None
+
+# Text columns behind the FTS5 update triggers from 8e14a7f3c2b6
+FTS_COLUMNS = {
+    'events': ('name', 'location', 'description'),
+    'groups': ('name', 'description'),
+}
+
+
+def _recreate_triggers(only_text_columns):
+    # Batch-mode table rebuilds on SQLite drop triggers, so recreate all three
+    for tablename, columns in FTS_COLUMNS.items():
+        fts = f"{tablename}_fts"
+        cols = ', '.join(columns)
+        new = ', '.join(f"new.{c}" for c in columns)
+        old = ', '.join(f"old.{c}" for c in columns)
+        of_columns = f" OF {cols}" if only_text_columns else ''
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tablename} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tablename} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE{of_columns} ON {tablename} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rsvp_going_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rsvp_maybe_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rsvp_not_going_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('member_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Counter updates would otherwise rewrite the FTS rows on every bump
+    if op.get_bind().dialect.name == 'sqlite':
+        _recreate_triggers(only_text_columns=True)
+
+    # Backfill: one GROUP BY per source table
+    op.execute("""
+        UPDATE events SET
+            rsvp_going_count = totals.going,
+            rsvp_maybe_count = totals.maybe,
+            rsvp_not_going_count = totals.not_going
+        FROM (
+            SELECT event_id,
+                   SUM(CASE WHEN status = 'going' THEN 1 ELSE 0 END) AS going,
+                   SUM(CASE WHEN status = 'maybe' THEN 1 ELSE 0 END) AS maybe,
+                   SUM(CASE WHEN status = 'not_going' THEN 1 ELSE 0 END) AS not_going
+            FROM rsvps GROUP BY event_id
+        ) AS totals
+        WHERE events.id = totals.event_id
+    """)
+    op.execute("""
+        UPDATE events SET comment_count = totals.total
+        FROM (SELECT event_id, COUNT(*) AS total FROM comments GROUP BY event_id) AS totals
+        WHERE events.id = totals.event_id
+    """)
+    op.execute("""
+        UPDATE groups SET member_count = totals.total
+        FROM (SELECT group_id, COUNT(*) AS total FROM group_member GROUP BY group_id) AS totals
+        WHERE groups.id = totals.group_id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.drop_column('member_count')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('rsvp_not_going_count')
+        batch_op.drop_column('rsvp_maybe_count')
+        batch_op.drop_column('rsvp_going_count')
+
+    if op.get_bind().dialect.name == 'sqlite':
+        _recreate_triggers(only_text_columns=False)
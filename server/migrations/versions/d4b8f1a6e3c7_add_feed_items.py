@@ -0,0 +1,46 @@
+"""add feed_items and group_member (group_id, user_id) index
+
+Revision ID: d4b8f1a6e3c7
+Revises: a7c5e3f1d9b4
+Create Date: 2026-10-18 18:42:10.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8f1a6e3c7'
+down_revision = 'a7c5e3f1d9b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('group_id', sa.Integer(), nullable=True),
+    sa.Column('actor_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('comment_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['actor_id'], ['users.id'], name=op.f('fk_feed_items_actor_id_users'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['comment_id'], ['comments.id'], name=op.f('fk_feed_items_comment_id_comments'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], name=op.f('fk_feed_items_event_id_events'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], name=op.f('fk_feed_items_group_id_groups'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_feed_items_user_id_users'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_feed_items_user_id_id', 'feed_items', ['user_id', 'id'], unique=False)
+    op.create_index('ix_feed_items_group_id_id', 'feed_items', ['group_id', 'id'], unique=False)
+    # Fan-out reads a group's members; the primary key is (user_id, group_id)
+    op.create_index('ix_group_member_group_id_user_id', 'group_member', ['group_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_group_member_group_id_user_id', table_name='group_member')
+    op.drop_index('ix_feed_items_group_id_id', table_name='feed_items')
+    op.drop_index('ix_feed_items_user_id_id', table_name='feed_items')
+    op.drop_table('feed_items')
@@ -0,0 +1,38 @@
+"""add outbox_messages
+
+Revision ID: e6c1a9f4b2d8
+Revises: b9e2d7c4a1f6
+Create Date: 2026-10-18 22:14:03.557120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c1a9f4b2d8'
+down_revision = 'b9e2d7c4a1f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('locked_by', sa.String(length=64), nullable=True),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_messages_status_available_at', 'outbox_messages', ['status', 'available_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_outbox_messages_status_available_at', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
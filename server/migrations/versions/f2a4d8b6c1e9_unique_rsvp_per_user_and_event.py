@@ -0,0 +1,52 @@
+"""unique rsvp per user and event
+
+Revision ID: f2a4d8b6c1e9
+Revises: c3f9e6a1b8d2
+Create Date: 2026-10-18 15:02:37.118490
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a4d8b6c1e9'
+down_revision = 'c3f9e6a1b8d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the latest (highest id) RSVP per user and event, in one statement
+    op.execute("""
+        DELETE FROM rsvps WHERE id NOT IN (
+            SELECT MAX(id) FROM rsvps GROUP BY user_id, event_id
+        )
+    """)
+
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.drop_index('ix_rsvps_user_id_event_id')
+        batch_op.create_index('uq_rsvps_user_id_event_id', ['user_id', 'event_id'], unique=True)
+
+    # The deleted duplicates were still counted
+    op.execute("""
+        UPDATE events SET
+            rsvp_going_count = totals.going,
+            rsvp_maybe_count = totals.maybe,
+            rsvp_not_going_count = totals.not_going
+        FROM (
+            SELECT event_id,
+                   SUM(CASE WHEN status = 'going' THEN 1 ELSE 0 END) AS going,
+                   SUM(CASE WHEN status = 'maybe' THEN 1 ELSE 0 END) AS maybe,
+                   SUM(CASE WHEN status = 'not_going' THEN 1 ELSE 0 END) AS not_going
+            FROM rsvps GROUP BY event_id
+        ) AS totals
+        WHERE events.id = totals.event_id
+    """)
+
+
+def downgrade():
+    # Removed duplicates are not restored
+    with op.batch_alter_table('rsvps', schema=None) as batch_op:
+        batch_op.drop_index('uq_rsvps_user_id_event_id')
+        batch_op.create_index('ix_rsvps_user_id_event_id', ['user_id', 'event_id'], unique=False)
@@ -1,14 +1,60 @@
+from datetime import datetime
+from operator import attrgetter
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy_serializer import SerializerMixin
 from config import db
-import bcrypt
+from passwords import hasher
+
+
+def format_datetime(value):
+    # Same text as SerializerMixin's '%Y-%m-%d %H:%M:%S' for the naive
+    # datetimes stored here, without strftime's format parsing
+    return value.isoformat(' ', 'seconds') if value is not None else None
+
+
+class FastSerializerMixin:
+    # Hand-listed replacement for SerializerMixin.to_dict() on hot paths: no
+    # rule parsing or relationship introspection, just an attrgetter over
+    # serialize_fields plus per-field formatters. Output matches to_dict().
+    serialize_fields = ()
+    serialize_formatters = {}
+
+    @classmethod
+    def _compiled_serializer(cls):
+        serializer = cls.__dict__.get('_serializer')
+        if serializer is None:
+            serializer = cls._serializer = _compile_serializer(cls.serialize_fields, cls.serialize_formatters)
+        return serializer
+
+    def serialize(self):
+        return self._compiled_serializer()(self)
+
+
+def _compile_serializer(fields, formatters):
+    getter = attrgetter(*fields)
+    converters = [(i, formatters[name]) for i, name in enumerate(fields) if name in formatters]
+    if len(fields) == 1:
+        getter = (lambda get: lambda obj: (get(obj),))(getter)
+
+    def serialize(obj):
+        values = getter(obj)
+        if converters:
+            values = list(values)
+            for i, convert in converters:
+                values[i] = convert(values[i])
+        return dict(zip(fields, values))
+
+    return serialize
 
 # Association table for the many-to-many relationship between User and Group
 group_member = db.Table('group_member',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-    db.Column('group_id', db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    db.Column('group_id', db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'), primary_key=True),
+    # Members of a group; the primary key covers a user's groups
+    db.Index('ix_group_member_group_id_user_id', 'group_id', 'user_id'),
 )
 
-class User(db.Model, SerializerMixin):
+class User(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -17,6 +63,7 @@ class User(db.Model, SerializerMixin):
 
     
     serialize_rules = ('-password_hash', '-events', '-sent_invitations', '-received_invitations', '-comments', '-rsvps', '-groups')
+    serialize_fields = ('id', 'username', 'email')
 
     @property
     def password(self):
@@ -24,10 +71,10 @@ class User(db.Model, SerializerMixin):
 
     @password.setter
     def password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return hasher.verify(password, self.password_hash)
 
     events = db.relationship('Event', back_populates='user', cascade="all, delete-orphan")
     comments = db.relationship('Comment', back_populates='user', cascade="all, delete-orphan")
@@ -36,67 +83,91 @@ class User(db.Model, SerializerMixin):
     sent_invitations = db.relationship('GroupInvitation', foreign_keys='GroupInvitation.user_id', back_populates='inviter', cascade="all, delete-orphan")
     received_invitations = db.relationship('GroupInvitation', foreign_keys='GroupInvitation.invited_user_id', back_populates='invitee', cascade="all, delete-orphan")
 
-    def add_group(self, group):
-        if group not in self.groups:
-            self.groups.append(group)
-            db.session.commit()
-
-class Event(db.Model, SerializerMixin):
+class Event(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'events'
+    # Upcoming events per host (event_filters.py); also serves user_id lookups
+    __table_args__ = (db.Index('ix_events_user_id_date', 'user_id', 'date'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
-    date = db.Column(db.DateTime, nullable=False)
+    date = db.Column(db.DateTime, nullable=False, index=True)
     location = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-
+    # Denormalized counters, maintained by counters.py
+    rsvp_going_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rsvp_maybe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rsvp_not_going_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set by a background-mode delete until purge.py removes the row
+    deleted_at = db.Column(db.DateTime, index=True)
+
+    # Children go with the event through ON DELETE CASCADE, not one ORM
+    # DELETE per loaded row
     user = db.relationship('User', back_populates='events')
-    comments = db.relationship('Comment', back_populates='event', cascade="all, delete-orphan")
-    rsvps = db.relationship('RSVP', back_populates='event', cascade="all, delete-orphan")
+    comments = db.relationship('Comment', back_populates='event', cascade="all, delete-orphan", passive_deletes=True)
+    rsvps = db.relationship('RSVP', back_populates='event', cascade="all, delete-orphan", passive_deletes=True)
+
+    serialize_rules = ('-comments', '-rsvps', '-user', '-deleted_at')
+    serialize_fields = (
+        'id', 'name', 'date', 'location', 'description', 'user_id',
+        'rsvp_going_count', 'rsvp_maybe_count', 'rsvp_not_going_count', 'comment_count',
+    )
+    serialize_formatters = {'date': format_datetime}
 
-    serialize_rules = ('-comments', '-rsvps', '-user')
+RSVP_STATUSES = ('going', 'maybe', 'not_going')
 
-class RSVP(db.Model, SerializerMixin):
+
+class RSVP(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'rsvps'
+    # One RSVP per user and event; upserts target this index, and user_id
+    # lookups use its leading column
+    __table_args__ = (db.Index('uq_rsvps_user_id_event_id', 'user_id', 'event_id', unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False, index=True)
     status = db.Column(db.String(20), nullable=False)
 
     user = db.relationship('User', back_populates='rsvps')
     event = db.relationship('Event', back_populates='rsvps')
 
     serialize_rules = ('-user', '-event')
+    serialize_fields = ('id', 'user_id', 'event_id', 'status')
 
-class Comment(db.Model, SerializerMixin):
+class Comment(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'comments'
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False, index=True)
 
     user = db.relationship('User', back_populates='comments')
     event = db.relationship('Event', back_populates='comments')
 
     serialize_rules = ('-user', '-event')
+    serialize_fields = ('id', 'content', 'user_id', 'event_id')
 
-class Group(db.Model, SerializerMixin):
+class Group(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'groups'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    member_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    deleted_at = db.Column(db.DateTime, index=True)
 
-    members = db.relationship('User', secondary=group_member, back_populates='groups')
-    invitations = db.relationship('GroupInvitation', back_populates='group', cascade="all, delete-orphan")
+    members = db.relationship('User', secondary=group_member, back_populates='groups', passive_deletes=True)
+    invitations = db.relationship('GroupInvitation', back_populates='group', cascade="all, delete-orphan", passive_deletes=True)
 
-    serialize_rules = ('-invitations', 'members.username')
+    serialize_rules = ('-invitations', '-deleted_at', 'members.username')
+    serialize_fields = ('id', 'name', 'description', 'user_id', 'member_count', 'members')
+    serialize_formatters = {'members': lambda members: [member.serialize() for member in members]}
 
 
-class GroupInvitation(db.Model, SerializerMixin):
+class GroupInvitation(db.Model, SerializerMixin, FastSerializerMixin):
     __tablename__ = 'group_invitations'
+    __table_args__ = (db.Index('ix_group_invitations_invited_user_id_status', 'invited_user_id', 'status'),)
     id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     invited_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.String(20), nullable=False)
@@ -106,4 +177,52 @@ class GroupInvitation(db.Model, SerializerMixin):
     group = db.relationship('Group', back_populates='invitations')
 
     serialize_rules = ('-inviter', '-invitee', '-group')
+    serialize_fields = ('id', 'group_id', 'user_id', 'invited_user_id', 'status')
 
+
+class FeedItem(db.Model):
+    __tablename__ = 'feed_items'
+    # Materialized home feed (feed.py). A row addressed to one user, or, for
+    # groups too large to fan out to, one row per group read by every member.
+    __table_args__ = (
+        db.Index('ix_feed_items_user_id_id', 'user_id', 'id'),
+        db.Index('ix_feed_items_group_id_id', 'group_id', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'))
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id', ondelete='CASCADE'))
+    actor_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False, index=True)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id', ondelete='CASCADE'), index=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+    # Side effects queued in the writer's transaction for worker.py (see
+    # outbox.py). A row is deleted once its handler has committed.
+    __table_args__ = (db.Index('ix_outbox_messages_status_available_at', 'status', 'available_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Compared with the worker's utcnow(), so set from the same clock
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, server_default=db.func.now())
+    locked_by = db.Column(db.String(64))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
+# Eager-loading options for the read endpoints. Each tuple is passed to
+# Query.options() so a GET issues a fixed number of statements no matter how
+# many rows it returns.
+USER_PROFILE_LOADERS = (selectinload(User.groups),)
+GROUP_LOADERS = (selectinload(Group.members),)
+RSVP_LOADERS = (joinedload(RSVP.user),)
+INVITATION_LOADERS = (
+    joinedload(GroupInvitation.group).selectinload(Group.members),
+    joinedload(GroupInvitation.inviter),
+)
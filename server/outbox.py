@@ -0,0 +1,160 @@
+# Transactional outbox for post-write side effects. A write path calls
+# enqueue() before it commits, so the message exists exactly when the write
+# does, and the request never waits for the work. worker.py claims pending
+# messages in batches and runs each topic's handler in its own transaction,
+# which also deletes the message.
+#
+# Delivery is at least once: a claim is a lease, and a worker that dies
+# mid-message leaves it to be claimed again after OUTBOX_LEASE_SECONDS.
+# Handlers that only touch this database commit together with the delete,
+# so for them a message takes effect once. Failures are retried with
+# exponential backoff; after OUTBOX_MAX_ATTEMPTS a message is marked dead
+# and kept for `flask outbox-requeue`.
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from itertools import count
+import os
+import socket
+import threading
+
+import click
+from sqlalchemy import delete, or_, select, update
+
+from config import app, db
+from models import OutboxMessage
+
+HANDLERS = {}
+SERIAL_TOPICS = set()
+MAX_RETRY_DELAY = 3600
+
+outbox = OutboxMessage.__table__
+
+
+def handler(topic, max_concurrency=None):
+    # Registers func(session, payload) for a topic. max_concurrency caps how
+    # many of the worker's threads may run this topic at once; 1 also makes
+    # the worker deliver the topic's messages one after another in the
+    # order they were enqueued (a retried message goes after the rest).
+    def register(func):
+        limit = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        HANDLERS[topic] = (func, limit)
+        if max_concurrency == 1:
+            SERIAL_TOPICS.add(topic)
+        return func
+    return register
+
+
+def enqueue(session, topic, payload):
+    # Call inside the writer's transaction, before commit. payload must be
+    # JSON-serializable.
+    if topic not in HANDLERS:
+        raise LookupError(f"No outbox handler for {topic!r}")
+    if app.config['OUTBOX_DELIVERY'] == 'inline':
+        HANDLERS[topic][0](session, payload)
+    else:
+        session.add(OutboxMessage(topic=topic, payload=payload))
+
+
+def claim(token, batch_size):
+    # Leases up to batch_size ready messages to `token` in one UPDATE. The
+    # UPDATE re-checks the lease predicate, so under READ COMMITTED a worker
+    # that picked the same ids as another one skips the rows it lost; on
+    # PostgreSQL the subselect also skips rows another claim has locked.
+    now = datetime.utcnow()
+    leasable = (
+        outbox.c.status == 'pending',
+        outbox.c.available_at <= now,
+        or_(outbox.c.locked_until.is_(None), outbox.c.locked_until < now),
+    )
+    ready = select(outbox.c.id).where(*leasable).order_by(outbox.c.id).limit(batch_size)
+    dialect = db.session.get_bind().dialect
+    if dialect.name == 'postgresql':
+        ready = ready.with_for_update(skip_locked=True)
+    lease = update(outbox).where(outbox.c.id.in_(ready), *leasable).values(
+        locked_by=token, locked_until=now + timedelta(seconds=app.config['OUTBOX_LEASE_SECONDS']),
+    )
+    columns = (outbox.c.id, outbox.c.topic, outbox.c.payload, outbox.c.attempts)
+    if dialect.update_returning:
+        # Exactly the rows this UPDATE won
+        messages = sorted(db.session.execute(lease.returning(*columns)).all(), key=lambda message: message.id)
+        db.session.commit()
+    else:
+        db.session.execute(lease)
+        db.session.commit()
+        messages = db.session.execute(select(*columns).where(outbox.c.locked_by == token).order_by(outbox.c.id)).all()
+    db.session.remove()
+    return messages
+
+
+def _failed(message, token, error):
+    attempts = message.attempts + 1
+    delay = min(app.config['OUTBOX_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    db.session.execute(update(outbox).where(outbox.c.id == message.id, outbox.c.locked_by == token).values(
+        attempts=attempts,
+        status='dead' if attempts >= app.config['OUTBOX_MAX_ATTEMPTS'] else 'pending',
+        available_at=datetime.utcnow() + timedelta(seconds=delay),
+        locked_by=None,
+        locked_until=None,
+        last_error=f"{type(error).__name__}: {error}"[:2000],
+    ))
+    db.session.commit()
+
+
+def deliver(message, token):
+    func, limit = HANDLERS.get(message.topic, (None, None))
+    with app.app_context():
+        try:
+            if func is None:
+                raise LookupError(f"No outbox handler for {message.topic!r}")
+            with limit or nullcontext():
+                func(db.session, message.payload)
+                db.session.execute(delete(outbox).where(outbox.c.id == message.id, outbox.c.locked_by == token))
+                db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            app.logger.warning('Outbox message %s (%s) failed: %s', message.id, message.topic, error)
+            _failed(message, token, error)
+        finally:
+            db.session.remove()
+
+
+def _jobs(messages):
+    # One job per message, except that each serial topic's messages form a
+    # single job delivered in id order
+    jobs, serial = [], {}
+    for message in messages:
+        if message.topic in SERIAL_TOPICS:
+            if message.topic not in serial:
+                serial[message.topic] = []
+                jobs.append(serial[message.topic])
+            serial[message.topic].append(message)
+        else:
+            jobs.append([message])
+    return jobs
+
+
+def run(stop, worker_id=None):
+    # Claims and delivers batches until `stop` is set; in-flight messages
+    # finish before it returns
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    claims = count(1)
+    with ThreadPoolExecutor(app.config['OUTBOX_CONCURRENCY'], thread_name_prefix='outbox') as pool:
+        while not stop.is_set():
+            token = f"{worker_id}:{next(claims)}"
+            with app.app_context():
+                messages = claim(token, app.config['OUTBOX_BATCH_SIZE'])
+            if not messages:
+                stop.wait(app.config['OUTBOX_POLL_INTERVAL'])
+                continue
+            list(pool.map(lambda job: [deliver(message, token) for message in job], _jobs(messages)))
+
+
+@app.cli.command('outbox-requeue')
+def outbox_requeue_command():
+    """Give dead outbox messages a fresh set of attempts."""
+    result = db.session.execute(update(outbox).where(outbox.c.status == 'dead').values(
+        status='pending', attempts=0, available_at=datetime.utcnow(), last_error=None,
+    ))
+    db.session.commit()
+    click.echo(f"Requeued {result.rowcount} messages.")
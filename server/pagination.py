@@ -0,0 +1,95 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from flask import request
+from flask_restful import abort
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        abort(400, message="Invalid cursor")
+    if not isinstance(values, list) or not all(_scalar(value) for value in values):
+        abort(400, message="Invalid cursor")
+    return values
+
+
+def _scalar(value):
+    return isinstance(value, (int, float, str)) and not isinstance(value, bool)
+
+
+def _fits(key, value):
+    # Whether a cursor value can be compared with the key column; a string
+    # where an id belongs would otherwise reach the query
+    try:
+        expected = key.type.python_type
+    except NotImplementedError:
+        return _scalar(value)
+    if expected is float:
+        expected = (int, float)
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def page_args(default_limit=DEFAULT_PAGE_SIZE, args=None):
+    # Reads ?limit=N&after=<cursor>, capping limit at MAX_PAGE_SIZE. `args`
+    # defaults to the Flask request's query string.
+    args = request.args if args is None else args
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        abort(400, message="limit must be an integer")
+    if limit < 1:
+        abort(400, message="limit must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    after = args.get('after')
+    return limit, decode_cursor(after) if after else None
+
+
+def seek(query, keys, after):
+    # Rows strictly after the cursor position in `keys` order
+    if len(after) != len(keys) or not all(_fits(key, value) for key, value in zip(keys, after)):
+        abort(400, message="Invalid cursor")
+    if len(keys) == 1:
+        return query.filter(keys[0] > after[0])
+    return query.filter(tuple_(*keys) > tuple_(*after))
+
+
+def paginate(query, keys, limit, after=None, key_of=None):
+    # Keyset pagination: seek past the last key seen instead of using OFFSET,
+    # so every page costs one indexed range scan. `keys` are the ascending
+    # sort columns and `key_of` pulls the same values back out of a row.
+    key_of = key_of or (lambda row: (row.id,))
+    if after is not None:
+        query = seek(query, keys, after)
+
+    rows = query.order_by(*keys).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key_of(rows[-1]))
+    return rows, next_cursor
+
+
+def page_headers(next_cursor, base_url=None, args=None):
+    if next_cursor is None:
+        return {}
+    base_url = request.base_url if base_url is None else base_url
+    args = dict(request.args.to_dict() if args is None else args)
+    args['after'] = next_cursor
+    return {
+        'X-Next-Cursor': next_cursor,
+        'Link': f'<{base_url}?{urlencode(args)}>; rel="next"',
+    }
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import asyncio
+import threading
+
+import bcrypt
+
+from config import app
+
+
+class HasherBusy(Exception):
+    # The pool is full, or a hash took longer than the timeout
+    pass
+
+
+class PasswordHasher:
+    # Runs bcrypt on a small thread pool. bcrypt releases the GIL, so the
+    # pool size caps how many cores hashing may occupy while the remaining
+    # request threads keep serving reads. At most max_pending hashes may be
+    # queued or running; past that callers get HasherBusy straight away
+    # instead of stacking up behind a login burst.
+    def __init__(self, rounds=12, workers=2, max_pending=8, timeout=10):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, func, *args):
+        try:
+            return self._submit(func, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+
+    async def _run_async(self, func, *args):
+        # Same pool and limits, awaited instead of blocking the event loop
+        future = asyncio.wrap_future(self._submit(func, *args))
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy() from None
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, password_hash):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    async def hash_async(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return (await self._run_async(bcrypt.hashpw, password.encode('utf-8'), salt)).decode('utf-8')
+
+    async def verify_async(self, password, password_hash):
+        return await self._run_async(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        # bcrypt hashes look like $2b$<cost>$<salt+digest>
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+hasher = PasswordHasher(
+    rounds=app.config['BCRYPT_ROUNDS'],
+    workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+)
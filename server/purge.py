@@ -0,0 +1,128 @@
+# Deleting events and groups. Comments, RSVPs, invitations, memberships and
+# feed rows hang off ON DELETE CASCADE foreign keys, so with the default
+# DELETE_MODE=cascade the request deletes one row and the database removes
+# the children in the same statement.
+#
+# With DELETE_MODE=background the request only stamps deleted_at, which
+# hides the row from every ORM query (see _hide_deleted), and a purger
+# thread removes the children PURGE_BATCH_SIZE rows per transaction before
+# deleting the parent. A huge event then costs the request one UPDATE, and
+# no single purge transaction holds the write lock for long. The thread is
+# woken by each delete and otherwise sweeps every PURGE_INTERVAL seconds;
+# `flask purge-deleted` does the same sweep from cron or a shell.
+from datetime import datetime
+import threading
+
+import click
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from config import app, db
+from models import Event, Group, Comment, RSVP, GroupInvitation, FeedItem, group_member
+
+# (table, column pointing at the parent, key column to batch on), biggest first
+PURGE_CHILDREN = {
+    Event: [
+        (FeedItem.__table__, 'event_id', 'id'),
+        (Comment.__table__, 'event_id', 'id'),
+        (RSVP.__table__, 'event_id', 'id'),
+    ],
+    Group: [
+        (FeedItem.__table__, 'group_id', 'id'),
+        (group_member, 'group_id', 'user_id'),
+        (GroupInvitation.__table__, 'group_id', 'id'),
+    ],
+}
+
+_wakeup = threading.Event()
+_purger = None
+_purger_lock = threading.Lock()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(state):
+    # Soft-deleted events and groups are gone as far as the ORM is
+    # concerned, including joins and relationship loads under the query.
+    # Core statements against the tables (the purge itself) see every row.
+    if state.is_select and not state.is_column_load and not state.is_relationship_load:
+        state.statement = state.statement.options(
+            with_loader_criteria(Event, lambda cls: cls.deleted_at.is_(None), include_aliases=True),
+            with_loader_criteria(Group, lambda cls: cls.deleted_at.is_(None), include_aliases=True),
+        )
+
+
+def remove(instance):
+    # Deletes an Event or Group and commits, the way DELETE_MODE says to
+    if app.config['DELETE_MODE'] == 'background':
+        instance.deleted_at = datetime.utcnow()
+        db.session.commit()
+        start_purger()
+        _wakeup.set()
+    else:
+        db.session.delete(instance)
+        db.session.commit()
+
+
+def _purge_children(table, parent_column, key_column, parent_id, batch_size):
+    removed = 0
+    while True:
+        keys = select(table.c[key_column]).where(table.c[parent_column] == parent_id).limit(batch_size)
+        result = db.session.execute(
+            delete(table).where(table.c[parent_column] == parent_id, table.c[key_column].in_(keys))
+        )
+        db.session.commit()
+        removed += result.rowcount
+        if result.rowcount < batch_size:
+            return removed
+
+
+def purge_deleted(batch_size):
+    # Removes every soft-deleted event and group; returns the rows deleted
+    removed = 0
+    for model, children in PURGE_CHILDREN.items():
+        table = model.__table__
+        parent_ids = db.session.scalars(select(table.c.id).where(table.c.deleted_at.is_not(None))).all()
+        for parent_id in parent_ids:
+            for child_table, parent_column, key_column in children:
+                removed += _purge_children(child_table, parent_column, key_column, parent_id, batch_size)
+            removed += db.session.execute(delete(table).where(table.c.id == parent_id)).rowcount
+            db.session.commit()
+    return removed
+
+
+def _run():
+    while True:
+        _wakeup.wait(app.config['PURGE_INTERVAL'])
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                purge_deleted(app.config['PURGE_BATCH_SIZE'])
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Purge of deleted events and groups failed')
+            finally:
+                db.session.remove()
+
+
+def start_purger():
+    # Started on first use rather than at import, so it never runs in the
+    # gunicorn master or in CLI commands
+    global _purger
+    with _purger_lock:
+        if _purger is None or not _purger.is_alive():
+            _purger = threading.Thread(target=_run, name='purger', daemon=True)
+            _purger.start()
+
+
+def init_purge(app):
+    # Picks up rows left soft-deleted by a previous process
+    if app.config['DELETE_MODE'] == 'background':
+        app.before_request(start_purger)
+
+
+@app.cli.command('purge-deleted')
+@click.option('--batch-size', type=int, default=None, help='rows per transaction (default PURGE_BATCH_SIZE)')
+def purge_deleted_command(batch_size):
+    """Remove soft-deleted events and groups and everything under them."""
+    removed = purge_deleted(batch_size or app.config['PURGE_BATCH_SIZE'])
+    click.echo(f"Purged {removed} rows.")
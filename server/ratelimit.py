@@ -0,0 +1,233 @@
+# Admission control for the expensive endpoints. Each resource class in
+# RATE_LIMITS gets a token bucket per client (the user for authenticated
+# requests, otherwise the IP; always the IP for 'auth'), and each route in a
+# class may have at most CONCURRENCY_LIMITS[class] requests in flight per
+# process. Over the rate a request gets 429 with Retry-After; over the
+# concurrency cap, 503 with Retry-After: 1. Both are decided before the
+# request body, the JWT or the database is touched.
+#
+# Buckets live in RATE_LIMIT_BACKEND: sqlite (a small file every gunicorn
+# worker on the host shares), redis (shared across hosts), memory (per
+# process) or none.
+from functools import wraps
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from config import app
+
+IDLE_SECONDS = 3600
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        # Returns (granted, tokens left after this request)
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            granted = tokens >= 1
+            if granted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 100000:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] > now - IDLE_SECONDS}
+            return granted, tokens
+
+
+class SQLiteBuckets:
+    # One atomic UPSERT per request; every expression in SET reads the
+    # row's old values, so the refill, the check and the decrement all see
+    # the same state whichever worker gets the write lock first.
+    TAKE = """
+        INSERT INTO buckets (key, tokens, updated, granted) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - updated) * :rate)
+                     - (min(:burst, tokens + (:now - updated) * :rate) >= 1),
+            granted = min(:burst, tokens + (:now - updated) * :rate) >= 1,
+            updated = :now
+        RETURNING granted, tokens
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, granted INTEGER NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_buckets_updated ON buckets (updated)")
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Losing the last few bucket updates in a crash is harmless
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, burst, now):
+        connection = self._connect()
+        granted, tokens = connection.execute(self.TAKE, {'key': key, 'rate': rate, 'burst': burst, 'now': now}).fetchone()
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            connection.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,))
+        return bool(granted), tokens
+
+
+class RedisBuckets:
+    # The same arithmetic as a Lua script, so it is atomic in Redis
+    SCRIPT = """
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local tokens = tonumber(state[1]) or burst
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + (now - updated) * rate)
+        local granted = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            granted = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('EXPIRE', KEYS[1], ARGV[4])
+        return {granted, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.prefix = prefix
+        self._take = client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst, now):
+        granted, tokens = self._take(keys=[self.prefix + key], args=[rate, burst, now, IDLE_SECONDS])
+        return bool(granted), float(tokens)
+
+
+def parse_rate(value):
+    # "10/60" is 10 requests per 60 seconds, all of which may come at once
+    count, seconds = value.split('/')
+    return int(count) / float(seconds), int(count)
+
+
+def build_backend(config):
+    backend = config['RATE_LIMIT_BACKEND']
+    if backend == 'none':
+        return None
+    if backend == 'redis':
+        import redis
+        return RedisBuckets(redis.Redis.from_url(config['RATE_LIMIT_REDIS_URL']))
+    if backend == 'memory':
+        return MemoryBuckets()
+    return SQLiteBuckets(config['RATE_LIMIT_SQLITE_PATH'] or os.path.join(app.instance_path, 'ratelimit.db'))
+
+
+buckets = build_backend(app.config)
+
+
+def set_backend(backend):
+    global buckets
+    buckets = backend
+
+
+def too_many(retry_after):
+    return {"message": "Too many requests, try again later"}, 429, {"Retry-After": str(retry_after)}
+
+
+def busy():
+    return {"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"}
+
+
+# Bucket key -> time its next token arrives, for buckets that just refused
+# a request. Until then nothing can be granted, so this process answers
+# repeat offenders without touching the shared backend.
+_refused_until = {}
+
+
+def admit(limit_class, client):
+    # Takes a token for `client` in `limit_class`; returns None if the
+    # request may proceed, else the Retry-After in whole seconds
+    spec = app.config['RATE_LIMITS'].get(limit_class)
+    if buckets is None or not spec:
+        return None
+    key = f"{limit_class}:{client}"
+    now = time.time()
+    refused_until = _refused_until.get(key)
+    if refused_until is not None:
+        if now < refused_until:
+            return max(1, math.ceil(refused_until - now))
+        _refused_until.pop(key, None)
+
+    rate, burst = parse_rate(spec)
+    granted, tokens = buckets.take(key, rate, burst, now)
+    if granted:
+        return None
+    wait = (1 - tokens) / rate
+    if len(_refused_until) > 100000:
+        _refused_until.clear()
+    _refused_until[key] = now + wait
+    return max(1, math.ceil(wait))
+
+
+class ConcurrencyCap:
+    # Non-blocking: a full route turns requests away instead of queueing
+    def __init__(self, limit):
+        self._slots = threading.BoundedSemaphore(limit) if limit else None
+
+    def enter(self):
+        return self._slots is None or self._slots.acquire(blocking=False)
+
+    def exit(self):
+        if self._slots is not None:
+            self._slots.release()
+
+
+def client_key(limit_class):
+    if limit_class != 'auth':
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None
+        if identity is not None:
+            return f"user:{identity}"
+    return f"ip:{request.remote_addr}"
+
+
+def limited(limit_class):
+    # Resource method decorator; goes outside @jwt_required() and @cached
+    def decorator(method):
+        cap = ConcurrencyCap(app.config['CONCURRENCY_LIMITS'].get(limit_class, 0))
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            retry_after = admit(limit_class, client_key(limit_class))
+            if retry_after is not None:
+                return too_many(retry_after)
+            if not cap.enter():
+                return busy()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                cap.exit()
+        return wrapper
+    return decorator
+
+
+def init_rate_limits(app):
+    # Behind a reverse proxy remote_addr is the proxy; trust that many
+    # X-Forwarded-For hops instead
+    if app.config['PROXY_FIX_HOPS']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'])
@@ -0,0 +1,175 @@
+# Read/write splitting. With DATABASE_REPLICA_URLS set, GET and HEAD
+# requests read from a replica, picked per request by REPLICA_SELECTION:
+# round_robin, or least_connections (fewest connections this process has
+# checked out). Everything else stays on the primary: other methods, any
+# statement once the session has written, and the background work in the
+# outbox worker and purger, which runs outside a request.
+#
+# Replicas lag, so a client that just wrote reads from the primary for
+# READ_YOUR_WRITES_SECONDS afterwards; a cookie carries the deadline, so it
+# holds whichever worker or host serves the next request. For the same
+# window after a write invalidates a cached response, cache.py refills it
+# from the primary, so a lagging replica's copy isn't served to everyone.
+#
+# Point the URLs at streaming replicas of the primary in production. For a
+# local stand-in, list one or more SQLite files and keep them current with
+# `flask replica-sync --interval 1`.
+from itertools import count
+import os
+import sqlite3
+import threading
+import time
+
+import click
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+PIN_COOKIE = 'read_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaSet:
+    def __init__(self, urls, selection, options_for):
+        self.engines = [create_engine(url, **options_for(url)) for url in urls]
+        self.selection = selection
+        self._in_use = {id(engine): 0 for engine in self.engines}
+        self._turn = count()
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, 'checkout', self._counter(engine, 1))
+            event.listen(engine, 'checkin', self._counter(engine, -1))
+
+    def _counter(self, engine, step):
+        key = id(engine)
+
+        def track(*args):
+            with self._lock:
+                self._in_use[key] += step
+        return track
+
+    def in_use(self, engine):
+        return self._in_use[id(engine)]
+
+    def choose(self):
+        if self.selection == 'least_connections':
+            # Ties go round-robin, so an idle process still spreads its reads
+            start = next(self._turn)
+            ordered = self.engines[start % len(self.engines):] + self.engines[:start % len(self.engines)]
+            return min(ordered, key=self.in_use)
+        return self.engines[next(self._turn) % len(self.engines)]
+
+    def dispose(self):
+        for engine in self.engines:
+            engine.dispose()
+
+
+class RoutingSession(Session):
+    # db.session's class (see config.py). A session reads from one replica
+    # for its whole life, so a request never mixes two replicas' snapshots.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self.info.get('wrote'):
+            return primary
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+            return primary
+        if 'replica' not in self.info:
+            replicas = current_app.extensions.get('replicas')
+            use_replica = replicas is not None and has_request_context() and g.get('read_replica', False)
+            self.info['replica'] = replicas.choose() if use_replica else None
+        return self.info['replica'] or primary
+
+
+def use_primary():
+    # Sends the rest of this request's reads to the primary, e.g. when a
+    # replica's answer would be cached for everyone
+    if has_request_context():
+        g.read_replica = False
+        current_app.extensions['sqlalchemy'].session.info['replica'] = None
+
+
+def pinned_to_primary(window):
+    # The cookie is the client's own; a deadline further out than one
+    # window can only be forged, so it is ignored
+    try:
+        until = float(request.cookies.get(PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() < until <= time.time() + window
+
+
+def sqlite_path(url):
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    return url.database
+
+
+def resolve_sqlite_url(url, instance_path):
+    # Relative SQLite paths mean the instance folder, as they do for the
+    # primary's DATABASE_URL
+    path = sqlite_path(url)
+    if path is None or os.path.isabs(path):
+        return url
+    return make_url(url).set(database=os.path.join(instance_path, path)).render_as_string(hide_password=False)
+
+
+def sync_sqlite_replicas(primary_url, replica_urls):
+    # Copies the primary into each SQLite replica with the online backup
+    # API; readers of a replica see the old copy or the new one, never half
+    source_path = sqlite_path(primary_url)
+    if source_path is None:
+        raise click.ClickException('replica-sync copies SQLite files; use real replication for other databases')
+    source = sqlite3.connect(source_path)
+    try:
+        for url in replica_urls:
+            path = sqlite_path(url)
+            if path is None:
+                raise click.ClickException(f"Not a SQLite file: {url}")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            target = sqlite3.connect(path, timeout=30)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+
+def init_replicas(app, db):
+    from config import engine_options
+
+    urls = [resolve_sqlite_url(url, app.instance_path) for url in app.config['DATABASE_REPLICA_URLS']]
+
+    @app.cli.command('replica-sync')
+    @click.option('--interval', type=float, default=0, help='Keep copying every this many seconds.')
+    def replica_sync_command(interval):
+        """Copy the primary SQLite database into the SQLite replicas."""
+        if not urls:
+            raise click.ClickException('DATABASE_REPLICA_URLS is not set')
+        primary_url = db.engine.url.render_as_string(hide_password=False)
+        while True:
+            sync_sqlite_replicas(primary_url, urls)
+            if not interval:
+                break
+            time.sleep(interval)
+        click.echo(f"Synced {len(urls)} replicas.")
+
+    if not urls:
+        return
+    app.extensions['replicas'] = ReplicaSet(urls, app.config['REPLICA_SELECTION'], engine_options)
+    window = app.config['READ_YOUR_WRITES_SECONDS']
+
+    @app.before_request
+    def route_reads():
+        g.read_replica = request.method in READ_METHODS and not pinned_to_primary(window)
+
+    @app.after_request
+    def pin_after_write(response):
+        if request.method not in READ_METHODS and request.method != 'OPTIONS' and response.status_code < 400 and window:
+            response.set_cookie(PIN_COOKIE, f"{time.time() + window:.3f}", max_age=int(window) + 1,
+                                httponly=True, samesite='Strict')
+        return response
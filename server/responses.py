@@ -0,0 +1,87 @@
+# Response pipeline: compact JSON through orjson when it is installed (the
+# stdlib encoder otherwise) for both Flask-RESTful resources and app.json,
+# and gzip/brotli compression negotiated from Accept-Encoding for bodies of
+# at least COMPRESS_MIN_SIZE bytes. Set JSON_PRETTY=1 for indented output
+# while debugging, or COMPRESS_RESPONSES=0 when a proxy compresses instead.
+import gzip
+import json
+
+from flask import current_app, make_response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+
+
+def make_dumps(pretty=False, default=None):
+    # Returns dumps(obj) -> str
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return lambda obj: orjson.dumps(obj, default=default, option=options).decode('utf-8')
+    if pretty:
+        return lambda obj: json.dumps(obj, default=default, indent=2)
+    return lambda obj: json.dumps(obj, default=default, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # app.json (jsonify, dict responses, streaming.py) on the same encoder
+    def __init__(self, app):
+        super().__init__(app)
+        self._dumps = make_dumps(app.config['JSON_PRETTY'], default=self.default)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps(obj)
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(self._dumps(self._prepare_response_obj(args, kwargs)) + '\n',
+                                        mimetype=self.mimetype)
+
+
+def compress_response(response):
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    config = current_app.config
+    body = response.get_data()
+    if len(body) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        body, encoding = brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY']), 'br'
+    elif accepted['gzip']:
+        body, encoding = gzip.compress(body, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0), 'gzip'
+    else:
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_responses(app, api):
+    app.json = FastJSONProvider(app)
+    dumps = app.json.dumps
+
+    @api.representation('application/json')
+    def output_json(data, code, headers=None):
+        response = make_response(dumps(data) + '\n', code)
+        response.headers.extend(headers or {})
+        return response
+
+    if app.config['COMPRESS_RESPONSES']:
+        app.after_request(compress_response)
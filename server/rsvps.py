@@ -0,0 +1,63 @@
+# RSVPs are one row per (user, event). Writes go through upsert_rsvps, which
+# locks the touched events, issues INSERT ... ON CONFLICT DO UPDATE against
+# uq_rsvps_user_id_event_id and then recounts their RSVP counters.
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import db
+from counters import lock_events, refresh_rsvp_counts
+from models import RSVP
+
+INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def upsert_rsvps(rows):
+    # rows are dicts with user_id, event_id and status. A later row for the
+    # same (user, event) wins, as it would have with separate requests.
+    # Returns the stored RSVPs in the order their keys first appeared.
+    latest = {}
+    for row in rows:
+        latest[(row['user_id'], row['event_id'])] = row
+    if not latest:
+        return []
+
+    event_ids = {event_id for _, event_id in latest}
+    lock_events(event_ids)
+    insert = INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        rsvps = _upsert_portable(list(latest.values()))
+    else:
+        statement = insert(RSVP).values(list(latest.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[RSVP.user_id, RSVP.event_id],
+            set_={'status': statement.excluded.status},
+        ).returning(RSVP)
+        stored = db.session.scalars(statement, execution_options={'populate_existing': True})
+        by_key = {(rsvp.user_id, rsvp.event_id): rsvp for rsvp in stored}
+        rsvps = [by_key[key] for key in latest]
+
+    refresh_rsvp_counts(event_ids)
+    return rsvps
+
+
+def _upsert_portable(rows):
+    # Dialects without ON CONFLICT: one SELECT for existing rows, then
+    # update those and insert the rest
+    keys = [(row['user_id'], row['event_id']) for row in rows]
+    existing = {
+        (rsvp.user_id, rsvp.event_id): rsvp
+        for rsvp in db.session.scalars(select(RSVP).where(
+            db.tuple_(RSVP.user_id, RSVP.event_id).in_(keys)
+        ))
+    }
+    rsvps = []
+    for key, row in zip(keys, rows):
+        rsvp = existing.get(key)
+        if rsvp is None:
+            rsvp = RSVP(**row)
+            db.session.add(rsvp)
+        else:
+            rsvp.status = row['status']
+        rsvps.append(rsvp)
+    db.session.flush()
+    return rsvps
@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+import re
+
+from sqlalchemy import DDL, event, func, literal_column, or_, text
+from sqlalchemy.sql import column, table
+
+from config import db
+from models import User, Event, Group
+from pagination import paginate
+
+# Columns indexed for full-text search, per table
+SEARCH_COLUMNS = {
+    'users': ('username',),
+    'events': ('name', 'location', 'description'),
+    'groups': ('name', 'description'),
+}
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts_ddl(tablename, columns):
+    # SQLite: an external-content FTS5 table kept in sync by triggers
+    fts = f"{tablename}_fts"
+    cols = ', '.join(columns)
+    new = ', '.join(f"new.{c}" for c in columns)
+    old = ', '.join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{tablename}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tablename} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        # Only text edits touch the index, not counter updates
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {tablename} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def _tsvector_sql(columns):
+    document = " || ' ' || ".join(f"coalesce({c}, '')" for c in columns)
+    return f"to_tsvector('simple'::regconfig, {document})"
+
+
+def _gin_ddl(tablename, columns):
+    # PostgreSQL: a GIN expression index, which needs no sync logic
+    return f"CREATE INDEX IF NOT EXISTS ix_{tablename}_search ON {tablename} USING gin ({_tsvector_sql(columns)})"
+
+
+for _model in (User, Event, Group):
+    _name = _model.__tablename__
+    for _statement in _fts_ddl(_name, SEARCH_COLUMNS[_name]):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'before_drop', DDL(f"DROP TABLE IF EXISTS {_name}_fts").execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'after_create', DDL(_gin_ddl(_name, SEARCH_COLUMNS[_name])).execute_if(dialect='postgresql'))
+
+
+@contextmanager
+def bulk_load():
+    # Per-row FTS5 triggers dominate SQLite bulk inserts, so drop them while
+    # loading and rebuild each index once afterwards.
+    if db.engine.dialect.name != 'sqlite':
+        yield
+        return
+    for tablename in SEARCH_COLUMNS:
+        for suffix in ('ai', 'ad', 'au'):
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {tablename}_fts_{suffix}"))
+    db.session.commit()
+    try:
+        yield
+    finally:
+        for tablename, columns in SEARCH_COLUMNS.items():
+            for statement in _fts_ddl(tablename, columns):
+                db.session.execute(text(statement))
+            db.session.execute(text(f"INSERT INTO {tablename}_fts({tablename}_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+
+def _match(model, tokens, dialect):
+    # Returns (filter, rank) where a lower rank is a better match
+    tablename = model.__tablename__
+    if dialect == 'sqlite':
+        fts = table(f"{tablename}_fts", column('rowid'), column('rank'))
+        expression = ' '.join(f'"{token}"*' for token in tokens)
+        return literal_column(f"{tablename}_fts").op('MATCH')(expression), fts.c.rank, fts
+    if dialect == 'postgresql':
+        vector = literal_column(_tsvector_sql(SEARCH_COLUMNS[tablename]))
+        query = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(f"{token}:*" for token in tokens))
+        return vector.op('@@')(query), -func.ts_rank(vector, query), None
+    return None, None, None
+
+
+def search(query, model, text, limit, after=None):
+    # Ranked full-text search with prefix matching across SEARCH_COLUMNS,
+    # paginated by (rank, id). Dialects without an index fall back to ILIKE.
+    tokens = [token.lower() for token in TOKEN.findall(text)]
+    if not tokens:
+        return [], None
+
+    condition, rank, fts = _match(model, tokens, query.session.get_bind().dialect.name)
+    if condition is None:
+        columns = [getattr(model, name) for name in SEARCH_COLUMNS[model.__tablename__]]
+        query = query.filter(or_(*(c.ilike(f"%{text}%") for c in columns)))
+        return paginate(query, [model.id], limit, after)
+
+    if fts is not None:
+        query = query.join(fts, fts.c.rowid == model.id)
+    query = query.filter(condition).add_columns(rank.label('search_rank'))
+    rows, next_cursor = paginate(
+        query, [rank, model.id], limit, after,
+        key_of=lambda row: (row.search_rank, row[0].id),
+    )
+    return [row[0] for row in rows], next_cursor
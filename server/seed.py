@@ -1,99 +1,223 @@
 from faker import Faker
 from config import app, db
-from models import User, Event, Group, RSVP, Comment, GroupInvitation
+from models import User, Event, Group, RSVP, Comment, GroupInvitation, group_member
+from passwords import hasher
+from counters import reconcile_counters
+from search import bulk_load  # also registers the full-text search tables with create_all
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+import argparse
 import random
+import time
 
-# Initialize Faker
-fake = Faker()
-
-def seed_users(num_users=10):
-    users = []
-    for _ in range(num_users):
-        user = User(
-            username=fake.user_name(),
-            email=fake.email(),
-            password=fake.password(),  # This will be hashed in the User model
-        )
-        db.session.add(user)
-        users.append(user)
-    db.session.commit()
-    return users
-
-def seed_groups(users, num_groups=5):
-    groups = []
-    for _ in range(num_groups):
-        group = Group(
-            name=fake.word(),
-            description=fake.sentence(),
-            user_id=random.choice(users).id,
-        )
-        db.session.add(group)
-        groups.append(group)
-    db.session.commit()
-    return groups
-
-def seed_events(users, num_events=10):
-    events = []
-    for _ in range(num_events):
-        event = Event(
-            name=fake.catch_phrase(),
-            date=fake.date_this_year(),
-            location=fake.city(),
-            description=fake.paragraph(),
-            user_id=random.choice(users).id,
-        )
-        db.session.add(event)
-        events.append(event)
-    db.session.commit()
-    return events
-
-def seed_rsvps(users, events, num_rsvps=20):
-    for _ in range(num_rsvps):
-        rsvp = RSVP(
-            user_id=random.choice(users).id,
-            event_id=random.choice(events).id,
-            status=random.choice(['going', 'not_going', 'maybe']),
-        )
-        db.session.add(rsvp)
-    db.session.commit()
+# Every seeded user gets this password, hashed once up front
+SEED_PASSWORD = 'password'
 
-def seed_comments(users, events, num_comments=30):
-    for _ in range(num_comments):
-        comment = Comment(
-            content=fake.sentence(),
-            user_id=random.choice(users).id,
-            event_id=random.choice(events).id,
-        )
-        db.session.add(comment)
-    db.session.commit()
+RSVP_STATUSES = ['going', 'not_going', 'maybe']
+INVITATION_STATUSES = ['pending', 'accepted', 'declined']
+YEAR_START = datetime(datetime.now().year, 1, 1)
+
+
+def distinct_pair(i, n_left, n_right):
+    # The i-th of n_left * n_right distinct (left, right) id pairs, spread so
+    # consecutive rows don't all hit the same left id
+    left = i % n_left
+    right = (left * 7919 + i // n_left) % n_right
+    return left + 1, right + 1
+
+
+class FakeText:
+    # Faker costs ~50-100us per value, which would dominate a multi-million
+    # row seed, so each chunk draws a few hundred values per provider and
+    # samples from them.
+    POOL_SIZE = 200
+
+    def __init__(self, seed, rows):
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.rng = random.Random(seed)
+        self.size = min(rows, self.POOL_SIZE)
+        self.pools = {}
+
+    def __call__(self, provider):
+        pool = self.pools.get(provider)
+        if pool is None:
+            method = getattr(self.fake, provider)
+            pool = self.pools[provider] = [method() for _ in range(self.size)]
+        return self.rng.choice(pool)
+
+
+# Row generators. Each one builds the rows for ids [start, stop) from its own
+# seed, so output is identical however the chunks are spread over workers.
+def user_rows(start, stop, seed, counts, password_hash):
+    fake = FakeText(seed + start, stop - start)
+    return [
+        {'id': i, 'username': f"{fake('user_name')}{i}", 'email': f"{fake('user_name')}{i}@{fake('free_email_domain')}",
+         'password_hash': password_hash}
+        for i in range(start + 1, stop + 1)
+    ]
+
+
+def group_rows(start, stop, seed, counts, password_hash):
+    fake = FakeText(seed + start, stop - start)
+    rng = random.Random(seed + start)
+    return [
+        {'id': i, 'name': fake('word'), 'description': fake('sentence'), 'user_id': rng.randint(1, counts['users'])}
+        for i in range(start + 1, stop + 1)
+    ]
+
+
+def event_rows(start, stop, seed, counts, password_hash):
+    fake = FakeText(seed + start, stop - start)
+    rng = random.Random(seed + start)
+    return [
+        {
+            'id': i,
+            'name': fake('catch_phrase')[:80],
+            'date': YEAR_START + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+            'location': fake('city'),
+            'description': fake('paragraph'),
+            'user_id': rng.randint(1, counts['users']),
+        }
+        for i in range(start + 1, stop + 1)
+    ]
+
+
+def rsvp_rows(start, stop, seed, counts, password_hash):
+    rng = random.Random(seed + start)
+    rows = []
+    for i in range(start, stop):
+        event_id, user_id = distinct_pair(i, counts['events'], counts['users'])
+        rows.append({'user_id': user_id, 'event_id': event_id, 'status': rng.choice(RSVP_STATUSES)})
+    return rows
 
-def seed_group_invitations(users, groups, num_invitations=20):
-    for _ in range(num_invitations):
-        invited_user = random.choice(users)
-        group_invitation = GroupInvitation(
-            group_id=random.choice(groups).id,
-            user_id=random.choice(users).id,
-            invited_user_id=invited_user.id,
-            status=random.choice(['pending', 'accepted', 'declined']),
-        )
-        db.session.add(group_invitation)
+
+def comment_rows(start, stop, seed, counts, password_hash):
+    fake = FakeText(seed + start, stop - start)
+    rng = random.Random(seed + start)
+    return [
+        {'content': fake('sentence'), 'user_id': rng.randint(1, counts['users']), 'event_id': rng.randint(1, counts['events'])}
+        for _ in range(start, stop)
+    ]
+
+
+def membership_rows(start, stop, seed, counts, password_hash):
+    rows = []
+    for i in range(start, stop):
+        group_id, user_id = distinct_pair(i, counts['groups'], counts['users'])
+        rows.append({'user_id': user_id, 'group_id': group_id})
+    return rows
+
+
+def invitation_rows(start, stop, seed, counts, password_hash):
+    rng = random.Random(seed + start)
+    return [
+        {
+            'group_id': rng.randint(1, counts['groups']),
+            'user_id': rng.randint(1, counts['users']),
+            'invited_user_id': rng.randint(1, counts['users']),
+            'status': rng.choice(INVITATION_STATUSES),
+        }
+        for _ in range(start, stop)
+    ]
+
+
+# (count name, table, row generator) in foreign-key order
+PLAN = [
+    ('users', User.__table__, user_rows),
+    ('groups', Group.__table__, group_rows),
+    ('events', Event.__table__, event_rows),
+    ('rsvps', RSVP.__table__, rsvp_rows),
+    ('comments', Comment.__table__, comment_rows),
+    ('memberships', group_member, membership_rows),
+    ('invitations', GroupInvitation.__table__, invitation_rows),
+]
+
+
+def _generate(job):
+    generator, start, stop, seed, counts, password_hash = job
+    return generator(start, stop, seed, counts, password_hash)
+
+
+def seed_table(name, table, generator, counts, options, password_hash, pool):
+    total = counts[name]
+    jobs = (
+        (generator, start, min(start + options.batch_size, total), options.seed, counts, password_hash)
+        for start in range(0, total, options.batch_size)
+    )
+    batches = pool.imap(_generate, jobs) if pool else map(_generate, jobs)
+
+    started = time.perf_counter()
+    done = 0
+    for rows in batches:
+        # Core insert with a list of dicts runs as one executemany per batch
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+        done += len(rows)
+        if options.progress:
+            elapsed = time.perf_counter() - started
+            print(f"\r{name:<12} {done:>12,}/{total:,}  {done / elapsed:>10,.0f} rows/s", end='', flush=True)
+    if options.progress and total:
+        print()
+
+
+def reset_sequences():
+    # Explicit ids leave PostgreSQL sequences behind the data
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('users', 'groups', 'events'):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+        ))
     db.session.commit()
 
-# Run the seed functions
-def seed_all():
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed the database. Defaults build a small demo dataset.')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--groups', type=int, default=5)
+    parser.add_argument('--events', type=int, default=10)
+    parser.add_argument('--rsvps', type=int, default=20)
+    parser.add_argument('--comments', type=int, default=30)
+    parser.add_argument('--memberships', type=int, default=0, help='group_member rows')
+    parser.add_argument('--invitations', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per executemany batch')
+    parser.add_argument('--seed', type=int, default=0, help='random seed; the same seed reproduces the same data')
+    parser.add_argument('--workers', type=int, default=0, help='processes generating Faker rows (0 = in-process)')
+    parser.add_argument('--quiet', dest='progress', action='store_false')
+    return parser.parse_args()
+
+
+def seed_all(options):
+    counts = {name: getattr(options, name) for name, _, _ in PLAN}
+    if counts['rsvps'] > counts['users'] * counts['events']:
+        raise SystemExit('--rsvps cannot exceed users * events (one RSVP per user and event)')
+    if counts['memberships'] > counts['users'] * counts['groups']:
+        raise SystemExit('--memberships cannot exceed users * groups')
+
     with app.app_context():  # Ensure the application context is active
         db.drop_all()
         db.create_all()
 
-        users = seed_users()
-        groups = seed_groups(users)
-        events = seed_events(users)
-        
-        seed_rsvps(users, events)
-        seed_comments(users, events)
-        seed_group_invitations(users, groups)
+        password_hash = hasher.hash(SEED_PASSWORD)
+        started = time.perf_counter()
+        pool = Pool(options.workers) if options.workers > 0 else None
+        try:
+            with bulk_load():
+                for name, table, generator in PLAN:
+                    seed_table(name, table, generator, counts, options, password_hash, pool)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        reset_sequences()
+        reconcile_counters()
+
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        print(f"Database seeded successfully! {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+        print(f"Every user's password is '{SEED_PASSWORD}'")
 
-        print("Database seeded successfully!")
 
 if __name__ == "__main__":
-    seed_all()
+    seed_all(parse_args())
@@ -0,0 +1,57 @@
+# Streaming mode for collection endpoints. Instead of a page of results,
+# the whole collection is sent as it is read: the query runs with
+# yield_per, so only one batch of ORM objects is alive at a time (and
+# PostgreSQL uses a server-side cursor), and each row is encoded and
+# written as soon as its batch arrives.
+#
+# Selected per request with ?stream=ndjson (one JSON object per line),
+# ?stream=json (a chunked JSON array, same shape as the paged response) or
+# an Accept: application/x-ndjson header. ?after=<cursor> resumes a stream
+# the same way it continues a page.
+from flask import Response, current_app, request, stream_with_context
+from flask_restful import abort
+
+from pagination import decode_cursor, seek
+
+STREAM_BATCH_SIZE = 500
+NDJSON = 'application/x-ndjson'
+
+
+def stream_format(accept=None, args=None):
+    # 'ndjson', 'json' or None; accept/args default to the Flask request's
+    args = request.args if args is None else args
+    accept = request.headers.get('Accept', '') if accept is None else accept
+    requested = args.get('stream')
+    if requested in ('ndjson', 'json'):
+        return requested
+    if requested:
+        abort(400, message="stream must be ndjson or json")
+    if NDJSON in accept:
+        return 'ndjson'
+    return None
+
+
+def stream(query, keys, fmt, serialize=lambda row: row.serialize(), after=None):
+    # `after` is a decoded cursor; by default it comes from ?after=
+    if after is None and request.args.get('after'):
+        after = decode_cursor(request.args['after'])
+    if after is not None:
+        query = seek(query, keys, after)
+    rows = query.order_by(*keys).yield_per(STREAM_BATCH_SIZE)
+    dumps = current_app.json.dumps
+
+    def ndjson():
+        for row in rows:
+            yield dumps(serialize(row)) + '\n'
+
+    def json_array():
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + dumps(serialize(row))
+            separator = ','
+        yield ']'
+
+    if fmt == 'ndjson':
+        return Response(stream_with_context(ndjson()), mimetype=NDJSON)
+    return Response(stream_with_context(json_array()), mimetype='application/json')
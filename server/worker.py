@@ -0,0 +1,29 @@
+# Outbox worker (see outbox.py). Run one or more next to the web processes:
+#
+#   python -m server.worker      # from the repository root
+#   python -m worker             # from server/
+#
+# SIGTERM or Ctrl-C stops claiming; messages already claimed finish first.
+import os
+import signal
+import sys
+import threading
+
+if __package__:
+    # Run as server.worker: the app's modules import each other by bare name
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app  # noqa: E402  (registers every handler)
+from outbox import HANDLERS, run  # noqa: E402
+
+
+def main():
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    app.logger.info('Outbox worker handling %s', ', '.join(sorted(HANDLERS)))
+    run(stop)
+
+
+if __name__ == '__main__':
+    main()